@@ -1,36 +1,304 @@
 import random
+import time
 from settings import *
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from board import path_blocking_walls, shortest_path, walls_near_path
+from book import get_book
+from endgame import EndgameSolver, get_tablebase, WIN
+from walleval import HAS_NUMPY, evaluate_walls
+from evaluation import Evaluator
+from instrument import SearchStats, count_board_calls
+
+# Killer moves remembered per ply
+KILLER_SLOTS = 2
+
+class SearchAborted(Exception):
+    """Raised inside the search when the time or node budget is used up."""
+
+def new_ai(player_id, size=BOARD_SIZE, engine=None, **kwargs):
+    """
+    2-player AI of the engine set for this board size: `engine`, else
+    AI_ENGINE_BY_SIZE[size], else AI_ENGINE. 'alphabeta' is AI, 'mcts' is
+    mcts.MCTSAI; kwargs go to the constructor.
+    """
+    engine = engine or AI_ENGINE_BY_SIZE.get(size, AI_ENGINE)
+    if engine == 'mcts':
+        from mcts import MCTSAI
+        return MCTSAI(player_id, **kwargs)
+    if engine != 'alphabeta':
+        raise ValueError(f"unknown AI engine {engine!r}")
+    return AI(player_id, **kwargs)
 
 class AI:
-    def __init__(self, player_id):
+    def __init__(self, player_id, seed=None, workers=AI_WORKERS, depth=AI_DEPTH, weights=None):
         self.id = player_id
+        # Position scoring; weights=None reads the weights file (see evaluation.py)
+        self.evaluator = Evaluator(weights)
+        # Fixed search depth, used when get_best_move runs without a budget
+        self.depth = depth
+        # Shuffles root moves; a fixed seed makes the AI fully reproducible
+        self.rng = random.Random(seed)
+        # Kept across turns: positions from the previous search are often
+        # reached again. tt.stats() reports hit rate / occupancy of the last move.
+        self.tt = TranspositionTable(TT_SIZE)
+
+        # Budget / progress of the current search (see get_best_move)
+        self.nodes = 0
+        self.node_limit = None
+        self.deadline = None
+        self.stop_event = None
+        self.depth_reached = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        # Wall legality checks done / skipped thanks to a cutoff (staged_moves)
+        self.wall_checks = 0
+        self.wall_checks_skipped = 0
+
+        # Instrumentation (instrument.py): a SearchStats per move in last_stats,
+        # appended to stats_log if set. Off by default, and free when off
+        self.instrument = AI_INSTRUMENT or AI_STATS_LOG is not None
+        self.stats_log = AI_STATS_LOG
+        self.stats = None
+        self.last_stats = None
+
+        # Move ordering memory. Killers: {ply: [moves that caused a cutoff]},
+        # reset every turn. History: {move: score}, halved every turn.
+        self.killers = {}
+        self.history = {}
+        self._root_depth = 0
+
+        # Opening book (None if disabled or not built)
+        self.book = get_book() if AI_USE_BOOK else None
+        self.book_hits = 0
+
+        # Exact pawn-race solver (keeps its solved tables between moves)
+        self.endgame = EndgameSolver(get_tablebase()) if AI_USE_ENDGAME else None
+        self.endgame_hits = 0
+
+        # Pondering: {position key after an opponent reply: (answer, depth)}
+        self.ponder_cache = {}
+        self.ponder_hits = 0
+
+        # Root-parallel search across processes (see parallel.py)
+        self.workers = workers
+        self._parallel = None
+
+    def get_best_move(self, board, p1, p2, time_limit=AI_TIME_LIMIT, node_limit=AI_NODE_LIMIT, stop_event=None):
+        """
+        Iterative deepening: searches depth 1, 2, 3, ... and returns the best
+        move of the deepest iteration that finished. With no time/node limit it
+        stops at self.depth (AI_DEPTH); with a limit it keeps going (up to AI_MAX_DEPTH)
+        until the budget runs out, and the unfinished iteration is discarded.
+        Setting stop_event (a threading.Event) from another thread ends the
+        search the same way. nodes / depth_reached can be read while it runs.
+        With self.instrument on, last_stats describes the move afterwards.
+        """
+        stats = SearchStats(self.id, board.size) if self.instrument else None
+        # Search on a private copy so the live game state is never touched.
+        # Everything below mutates this one state in place and unwinds it.
+        board = board.clone()
+        ai_player = self.clone_player(p2 if self.id == 2 else p1)
+        opp_player = self.clone_player(p1 if self.id == 2 else p2)
+        board.reset_key((ai_player, opp_player), ai_player)
+        self.begin_search(time_limit, node_limit, stop_event)
+        if stats is not None:
+            self.stats = stats
+            count_board_calls(board, stats.counters)
+            stats.lap('setup')
+
+        limited = time_limit is not None or node_limit is not None
+        move, source = self._choose_move(board, ai_player, opp_player, AI_MAX_DEPTH if limited else self.depth)
+
+        if stats is not None:
+            stats.counters['wall_checks_skipped'] = self.wall_checks_skipped
+            stats.finish(move, source, self.nodes, self.cutoffs, self.tt.stats())
+            self.stats = None
+            self.last_stats = stats
+            if self.stats_log:
+                stats.write(self.stats_log)
+        return move
+
+    def _choose_move(self, board, ai_player, opp_player, max_depth):
+        """get_best_move on the private state: (move, where it came from)."""
+        # Opening book: zero-latency answers for the first plies
+        if self.book is not None:
+            move = self.book.lookup(board.key, board.size)
+            self._lap('book')
+            if move is not None and self._is_legal(board, move, ai_player, opp_player):
+                self.book_hits += 1
+                return move, 'book'
+
+        # Answer found while pondering on the opponent's time
+        cached = self.ponder_cache.get(board.key)
+        self._lap('ponder')
+        if cached is not None and cached[1] >= self.depth:
+            self.ponder_hits += 1
+            self.depth_reached = cached[1]
+            return cached[0], 'ponder'
+
+        # Pawn race: played exactly once walls can no longer change it
+        move = self._endgame_move(board, ai_player, opp_player)
+        self._lap('endgame')
+        if move is not None:
+            return move, 'endgame'
+
+        return self._search(board, ai_player, opp_player, max_depth), 'search'
+
+    def _search(self, board, ai_player, opp_player, max_depth):
+        """The search proper, once book and endgame had no answer (MCTSAI replaces it)."""
+        return self._deepen(board, ai_player, opp_player, max_depth)[0]
 
-    def get_best_move(self, board, p1, p2):
-        ai_player = p2 if self.id == 2 else p1
-        opp_player = p1 if self.id == 2 else p2
+    def _lap(self, phase):
+        if self.stats is not None:
+            self.stats.lap(phase)
 
+    def _deepen(self, board, ai_player, opp_player, max_depth):
+        """
+        The iterative deepening loop. Returns (best move, depth that move is
+        good for); a forced result or a single legal move counts as max_depth.
+        The depth is 0 if not even depth 1 finished.
+        """
+        self.depth_reached = 0  # Not left over from an earlier call (ponder runs several)
         # 1. Get all possible moves
         possible_moves = self.get_all_moves(board, ai_player, opp_player)
+        self._lap('movegen')
+        if len(possible_moves) <= 1:
+            return (possible_moves[0] if possible_moves else None), max_depth
+
+        # To prevent the AI from being too predictable, we shuffle. The
+        # ordering sort is stable, so this only breaks ties between equals
+        self.rng.shuffle(possible_moves)
+        self._order_moves(board, possible_moves, ai_player, opp_player, 0, self._tt_move(board),
+                          self._root_wall_scores(board, possible_moves, ai_player, opp_player))
+        self._lap('order')
+
+        best_move = possible_moves[0]
+        for depth in range(1, max_depth + 1):
+            try:
+                if self.workers > 1:
+                    move, score = self._parallel_root(board, possible_moves, depth, ai_player, opp_player)
+                else:
+                    move, score = self._search_root(board, possible_moves, depth, ai_player, opp_player)
+            except SearchAborted:
+                if self.stats is not None:
+                    self.stats.end_depth(depth, self.nodes, self.cutoffs, completed=False)
+                break
+            best_move = move
+            self.depth_reached = depth
+            if self.stats is not None:
+                self.stats.end_depth(depth, self.nodes, self.cutoffs, move, score)
+
+            # Next iteration starts from this iteration's best move
+            self._move_to_front(possible_moves, move)
+
+            # A forced win/loss will not change with more depth
+            if abs(score) >= 1000: return best_move, max_depth
+
+        return best_move, self.depth_reached
+
+    def _endgame_move(self, board, ai_player, opp_player):
+        """
+        The solver's move when neither side has walls left (exact), or when
+        only the AI has walls and wins the race without them (a won race
+        stays won: the AI simply never places another wall). None if the
+        solver gave up (see endgame.py).
+        """
+        if self.endgame is None or opp_player.walls_remaining > 0:
+            return None
+        # Only a share of the move's time: unless the race is won, the search runs afterwards
+        deadline = None
+        if self.deadline is not None:
+            now = time.perf_counter()
+            deadline = now + (self.deadline - now) * ENDGAME_TIME_SHARE
+        solved = self.endgame.solve(board, ai_player, opp_player, deadline, self.stop_event)
+        if solved is None:
+            return None  # Given up: too big or out of time
+        result, plies, move = solved
+        if move is None or (ai_player.walls_remaining > 0 and result != WIN):
+            return None
+        self.endgame_hits += 1
+        return move
+
+    def _is_legal(self, board, move, player, other):
+        """Guards book answers against (very unlikely) key collisions."""
+        if move[0] == 'move':
+            return move[1] in board.get_valid_moves(player, other)
+        return player.walls_remaining > 0 and board.is_legal_wall(move[1][0], move[1][1], move[2], player, other)
+
+    def ponder(self, board, p1, p2, stop_event):
+        """
+        Runs on the opponent's time until stop_event is set: searches the AI's
+        answer to each likely opponent reply (best-ordered replies first, then
+        all of them again one ply deeper, ...). Answers go to ponder_cache,
+        keyed by the position after the reply; the subtrees stay in the TT.
+        """
+        board = board.clone()
+        ai_player = self.clone_player(p2 if self.id == 2 else p1)
+        opp_player = self.clone_player(p1 if self.id == 2 else p2)
+        board.reset_key((ai_player, opp_player), opp_player)
+        self.begin_search(None, None, stop_event)
+        self.ponder_cache = {}
+
+        replies = self.get_all_moves(board, opp_player, ai_player)
+        self._order_moves(board, replies, opp_player, ai_player, 0, None)
+
+        for depth in range(self.depth, AI_MAX_DEPTH + 1):
+            for reply in replies:
+                if stop_event.is_set(): return
+                board.apply(reply, opp_player, ai_player)
+                key = board.key
+                cached = self.ponder_cache.get(key)
+                if cached is None or cached[1] < depth:
+                    self.killers = {}
+                    move, reached = self._deepen(board, ai_player, opp_player, depth)
+                    if stop_event.is_set() and reached < depth:
+                        return  # Aborted mid-search: the board was not unwound
+                    self.ponder_cache[key] = (move, reached)
+                board.undo()
+
+    def begin_search(self, time_limit, node_limit, stop_event=None):
+        """Resets the per-move budget, counters and ordering memory."""
+        self.tt.new_search()
+        self.nodes = 0
+        self.node_limit = node_limit
+        self.deadline = time.perf_counter() + time_limit if time_limit else None
+        self.stop_event = stop_event
+        self.stats = None
+        self.depth_reached = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.wall_checks = 0
+        self.wall_checks_skipped = 0
+        self.killers = {}
+        self.history = {move: score // 2 for move, score in self.history.items() if score > 1}
+
+    def _parallel_root(self, board, moves, depth, ai_player, opp_player):
+        if self._parallel is None:
+            from parallel import ParallelRootSearch
+            self._parallel = ParallelRootSearch(self.workers)
+        return self._parallel.search(self, board, moves, depth, ai_player, opp_player)
+
+    def close(self):
+        """Shuts down the worker processes of the parallel mode, if any were started."""
+        if self._parallel is not None:
+            self._parallel.close()
+            self._parallel = None
 
+    def _search_root(self, board, moves, depth, ai_player, opp_player):
         best_score = -float('inf')
         best_move = None
 
         alpha = -float('inf')
         beta = float('inf')
+        self._root_depth = depth
 
-        # To prevent the AI from being too predictable, we shuffle
-        random.shuffle(possible_moves)
+        for move in moves:
+            board.apply(move, ai_player, opp_player)
 
-        for move in possible_moves:
-            sim_board = board.clone()
-            sim_ai = self.clone_player(ai_player)
-            sim_opp = self.clone_player(opp_player)
+            # Current move + depth - 1 replies
+            score = self.minimax(board, depth - 1, alpha, beta, False, ai_player, opp_player)
 
-            self.apply_move(sim_board, sim_ai, sim_opp, move)
-
-            # Using Depth 2 (Current move + Opponent response)
-            # Increase AI_DEPTH in settings.py to 3 if your computer is fast
-            score = self.minimax(sim_board, AI_DEPTH - 1, alpha, beta, False, sim_ai, sim_opp)
+            board.undo()
 
             if score > best_score:
                 best_score = score
@@ -40,118 +308,287 @@ class AI:
             if beta <= alpha:
                 break
 
-        return best_move
+        self.tt.store(board.key, depth, best_score, EXACT, best_move)
+        return best_move, best_score
+
+    def search_stats(self):
+        """Counters of the last get_best_move, to measure how well pruning works."""
+        return {
+            'nodes': self.nodes,
+            'depth': self.depth_reached,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoff_rate': round(self.first_move_cutoffs / self.cutoffs, 4) if self.cutoffs else 0.0,
+            'wall_checks': self.wall_checks,
+            'wall_checks_skipped': self.wall_checks_skipped,
+            'tt': self.tt.stats(),
+        }
+
+    def _check_limits(self):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchAborted()
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchAborted()
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchAborted()
 
-    def evaluate_state(self, board, ai_p, opp_p):
+    def evaluate_state(self, board, ai_p, opp_p, ai_to_move=True):
         """
         The Brain of the AI. 
-        Higher score = Better for AI.
+        Higher score = Better for AI. The features and their weights are in
+        evaluation.py; by default opp_dist * 1.5 - ai_dist + wall difference * 0.5.
         """
-        ai_dist = board.get_shortest_path_len(ai_p.pos, ai_p.goal_row)
-        opp_dist = board.get_shortest_path_len(opp_p.pos, opp_p.goal_row)
-
-        # Handle blocked paths (shouldn't happen with Quoridor rules, but safe-check)
-        if ai_dist == -1: ai_dist = 50 
-        if opp_dist == -1: opp_dist = 50
-
-        # Victory / Defeat conditions
-        if ai_dist == 0: return 1000
-        if opp_dist == 0: return -1000
-
-        # --- HEURISTIC CALCULATION ---
-        # 1. Distance difference: We want a high gap (AI closer, Player further)
-        # We multiply Opponent distance by 1.2 to make AI more aggressive in blocking
-        score = (opp_dist * 1.5) - (ai_dist)
-
-        # 2. Wall count: AI should value having more walls than the opponent
-        score += (ai_p.walls_remaining - opp_p.walls_remaining) * 0.5
-
-        return score
+        return self.evaluator.evaluate(board, ai_p, opp_p, ai_to_move)
 
     def minimax(self, board, depth, alpha, beta, is_maximizing, ai_player, opp_player):
+        self._check_limits()
         if depth == 0:
-            return self.evaluate_state(board, ai_player, opp_player)
+            return self.evaluate_state(board, ai_player, opp_player, is_maximizing)
+
+        # Transposition table: a result searched at least this deep can answer
+        # the node outright if its bound already settles the (alpha, beta) window
+        alpha_orig, beta_orig = alpha, beta
+        tt_move = None
+        entry = self.tt.probe(board.key)
+        if entry is not None:
+            _, tt_depth, tt_score, tt_flag, tt_move, _ = entry
+            if tt_depth >= depth:
+                if tt_flag == EXACT: return tt_score
+                if tt_flag == LOWER and tt_score >= beta: return tt_score
+                if tt_flag == UPPER and tt_score <= alpha: return tt_score
 
         # Check for terminal states
-        ai_dist = board.get_shortest_path_len(ai_player.pos, ai_player.goal_row)
-        opp_dist = board.get_shortest_path_len(opp_player.pos, opp_player.goal_row)
+        ai_dist = board.get_shortest_path_len(ai_player.pos, ai_player.goal)
+        opp_dist = board.get_shortest_path_len(opp_player.pos, opp_player.goal)
         if ai_dist == 0: return 1000
         if opp_dist == 0: return -1000
 
+        ply = self._root_depth - depth
+        best_move = None
         if is_maximizing:
             max_eval = -float('inf')
-            moves = self.get_all_moves(board, ai_player, opp_player)
-            for move in moves:
-                sim_board = board.clone()
-                sim_ai = self.clone_player(ai_player)
-                sim_opp = self.clone_player(opp_player)
-                self.apply_move(sim_board, sim_ai, sim_opp, move)
-
-                eval = self.minimax(sim_board, depth - 1, alpha, beta, False, sim_ai, sim_opp)
-                max_eval = max(max_eval, eval)
+            moves = self.staged_moves(board, ai_player, opp_player, ply, tt_move)
+            for i, move in enumerate(moves):
+                board.apply(move, ai_player, opp_player)
+                eval = self.minimax(board, depth - 1, alpha, beta, False, ai_player, opp_player)
+                board.undo()
+
+                if eval > max_eval:
+                    max_eval = eval
+                    best_move = move
                 alpha = max(alpha, eval)
-                if beta <= alpha: break
-            return max_eval
+                if beta <= alpha:
+                    self._record_cutoff(move, i, ply, depth)
+                    break
+            best = max_eval
         else:
             min_eval = float('inf')
-            moves = self.get_all_moves(board, opp_player, ai_player)
-            for move in moves:
-                sim_board = board.clone()
-                sim_ai = self.clone_player(ai_player)
-                sim_opp = self.clone_player(opp_player)
-                self.apply_move(sim_board, sim_opp, sim_ai, move) # Opponent is moving
-
-                eval = self.minimax(sim_board, depth - 1, alpha, beta, True, sim_ai, sim_opp)
-                min_eval = min(min_eval, eval)
+            moves = self.staged_moves(board, opp_player, ai_player, ply, tt_move)
+            for i, move in enumerate(moves):
+                board.apply(move, opp_player, ai_player) # Opponent is moving
+                eval = self.minimax(board, depth - 1, alpha, beta, True, ai_player, opp_player)
+                board.undo()
+
+                if eval < min_eval:
+                    min_eval = eval
+                    best_move = move
                 beta = min(beta, eval)
-                if beta <= alpha: break
-            return min_eval
+                if beta <= alpha:
+                    self._record_cutoff(move, i, ply, depth)
+                    break
+            best = min_eval
+        moves.close()  # Counts the walls a cutoff left unchecked
+
+        # Classify against the window this node was called with
+        if best <= alpha_orig: flag = UPPER
+        elif best >= beta_orig: flag = LOWER
+        else: flag = EXACT
+        self.tt.store(board.key, depth, best, flag, best_move)
+        return best
+
+    def _tt_move(self, board):
+        entry = self.tt.probe(board.key)
+        return entry[4] if entry is not None else None
+
+    def _root_wall_scores(self, board, moves, ai_player, opp_player):
+        """
+        {wall move: evaluation change} for every root wall, computed in one
+        NumPy batch (walleval.py). None where the batch does not pay off.
+        """
+        if not HAS_NUMPY or board.size < WALLEVAL_MIN_SIZE:
+            return None
+        walls = [(m[1][0], m[1][1], m[2]) for m in moves if m[0] == 'wall']
+        _, _, _, delta = evaluate_walls(board, ai_player, opp_player, walls, self.evaluator.weights)
+        return {('wall', (c, r), o): d for (c, r, o), d in zip(walls, delta)}
+
+    def _order_moves(self, board, moves, mover, other, ply, tt_move, wall_scores=None):
+        """
+        Sorts moves best-first for alpha-beta, in place:
+          0. the transposition-table / previous-iteration best move
+          1. pawn moves that shorten the mover's shortest path
+          2. killer moves for this ply
+          3. walls that cut the other player's shortest path
+          4. remaining pawn moves, 5. remaining walls
+        Inside a group walls with a better wall_score (root only) come first,
+        then moves with better history scores. The sort is stable, so any
+        remaining ties keep the incoming (at the root: shuffled) order.
+        """
+        scores = wall_scores or {}
+        my_dist = board.get_shortest_path_len(mover.pos, mover.goal)
+        blocking = None
+        killers = self.killers.get(ply, ())
+        history = self.history
+
+        def rank(move):
+            nonlocal blocking
+            if move == tt_move: return (0, 0, 0)
+            if move[0] == 'move':
+                if board.get_shortest_path_len(move[1], mover.goal) < my_dist:
+                    group = 1
+                else:
+                    group = 2 if move in killers else 4
+            elif move in killers:
+                group = 2
+            else:
+                if blocking is None:
+                    blocking = path_blocking_walls(board, other.pos, other.goal)
+                group = 3 if (move[1], move[2]) in blocking else 5
+            return (group, -scores.get(move, 0), -history.get(move, 0))
+
+        moves.sort(key=rank)
+
+    def _record_cutoff(self, move, index, ply, depth):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        self.history[move] = self.history.get(move, 0) + depth * depth
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[KILLER_SLOTS:]
 
-    def get_all_moves(self, board, active_player, waiting_player):
+    def _move_to_front(self, moves, move):
+        """Searches a remembered best move first (keeps the rest in order)."""
+        if move is not None and move in moves:
+            moves.remove(move)
+            moves.insert(0, move)
+
+    def get_all_moves(self, board, active_player, waiting_player, *other_players):
+        """
+        Pawn moves and relevant walls of active_player. Walls are looked for
+        along the shortest paths of the two players; other_players (4-player
+        games) still block pawn moves and must keep a path to their goals.
+        """
         moves = []
 
         # 1. Pawn Moves
-        pawn_moves = board.get_valid_moves(active_player, waiting_player)
+        pawn_moves = board.get_valid_moves(active_player, waiting_player, *other_players)
         for pm in pawn_moves:
             moves.append(('move', pm))
 
         # 2. Wall Moves (Only check if player has walls)
         if active_player.walls_remaining > 0:
-            # We search a 2-cell radius around both players.
-            # This allows the AI to place walls slightly further away to create bottlenecks.
-            focus_points = [active_player.pos, waiting_player.pos]
-            checked_spots = set()
-
-            for fx, fy in focus_points:
-                for cx in range(fx - 2, fx + 2):
-                    for cy in range(fy - 2, fy + 2):
-                        if 0 <= cx < board.size - 1 and 0 <= cy < board.size - 1:
-                            if (cx, cy) in checked_spots: continue
-                            checked_spots.add((cx, cy))
-
-                            # Test Horizontal
-                            test_h = board.clone()
-                            if test_h.place_wall(cx, cy, 'H', active_player, waiting_player):
-                                moves.append(('wall', (cx, cy), 'H'))
-
-                            # Test Vertical
-                            test_v = board.clone()
-                            if test_v.place_wall(cx, cy, 'V', active_player, waiting_player):
-                                moves.append(('wall', (cx, cy), 'V'))
+            players = (active_player, waiting_player) + other_players
+            for wall in self._wall_candidates(board, active_player, waiting_player):
+                # O(1) for most walls; only walls that could close off a
+                # region fall back to a path search
+                if board.is_legal_wall(*wall, *players):
+                    moves.append(('wall', (wall[0], wall[1]), wall[2]))
         return moves
 
+    def _wall_candidates(self, board, active_player, waiting_player):
+        """
+        (c, r, orient) of the walls worth trying, legal or not. Only walls that
+        touch either player's shortest path are looked at (AI_WALL_RADIUS
+        widens that band), so the count grows with path length, not with
+        board area. The waiting player's path comes first.
+        """
+        walls = []
+        seen = set()
+        for p in (waiting_player, active_player):
+            path = shortest_path(board, p.pos, p.goal)
+            for wall in walls_near_path(board.size, path, AI_WALL_RADIUS):
+                if wall in seen: continue
+                seen.add(wall)
+                walls.append(wall)
+        return walls
+
+    def staged_moves(self, board, mover, other, ply, tt_move, *other_players):
+        """
+        get_all_moves + _order_moves for the inner nodes of the search, as a
+        generator: the same moves in the same order, produced one stage (one
+        _order_moves group) at a time. A wall's legality is only checked when
+        the wall is about to be searched, so a cutoff skips the checks of
+        every wall after it; wall_checks / wall_checks_skipped count both.
+        Only valid while the board is at this node's position between moves.
+        """
+        history = self.history
+        by_history = lambda move: -history.get(move, 0)
+        killers = self.killers.get(ply, ())
+        pawns = [('move', pos) for pos in board.get_valid_moves(mover, other, *other_players)]
+        walls = []
+        if mover.walls_remaining > 0:
+            walls = [('wall', (c, r), o) for c, r, o in self._wall_candidates(board, mover, other)]
+        players = (mover, other) + other_players
+        done = set()
+        checked = 0
+
+        def legal(move):
+            nonlocal checked
+            done.add(move)
+            checked += 1
+            return board.is_legal_wall(move[1][0], move[1][1], move[2], *players)
+
+        try:
+            # 0. TT move
+            if tt_move is not None:
+                if tt_move in pawns:
+                    done.add(tt_move)
+                    yield tt_move
+                elif tt_move in walls and legal(tt_move):
+                    yield tt_move
+
+            # 1. Pawn moves that shorten the mover's path
+            my_dist = board.get_shortest_path_len(mover.pos, mover.goal)
+            for move in sorted((m for m in pawns if m not in done
+                                and board.get_shortest_path_len(m[1], mover.goal) < my_dist), key=by_history):
+                done.add(move)
+                yield move
+
+            # 2. Killers
+            if killers:
+                for move in sorted([m for m in pawns if m in killers and m not in done]
+                                   + [m for m in walls if m in killers and m not in done], key=by_history):
+                    if move[0] == 'move':
+                        done.add(move)
+                        yield move
+                    elif legal(move):
+                        yield move
+
+            # 3. Walls cutting the other player's shortest path
+            if walls:
+                blocking = path_blocking_walls(board, other.pos, other.goal)
+                for move in sorted((m for m in walls if m not in done and (m[1], m[2]) in blocking),
+                                   key=by_history):
+                    if legal(move):
+                        yield move
+
+            # 4. Remaining pawn moves, 5. remaining walls
+            for move in sorted((m for m in pawns if m not in done), key=by_history):
+                done.add(move)
+                yield move
+            for move in sorted((m for m in walls if m not in done), key=by_history):
+                if legal(move):
+                    yield move
+        finally:
+            self.wall_checks += checked
+            self.wall_checks_skipped += len(walls) - checked
+
     def apply_move(self, board, active_player, waiting_player, move):
-        m_type = move[0]
-        if m_type == 'move':
-            active_player.pos = move[1]
-        elif m_type == 'wall':
-            coords = move[1]
-            orient = move[2]
-            board.place_wall(coords[0], coords[1], orient, active_player, waiting_player)
-            active_player.walls_remaining -= 1
+        board.apply(move, active_player, waiting_player)
 
     def clone_player(self, player):
         from player import Player
-        p = Player(player.pos, player.color, player.goal_row, player.id)
+        p = Player(player.pos, player.color, player.goal_row, player.id, player.goal_col)
         p.walls_remaining = player.walls_remaining
         return p
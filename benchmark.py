@@ -0,0 +1,192 @@
+"""
+Benchmarks for the board primitives and the AI search.
+
+    python benchmark.py --save baseline.json         # measure and keep as baseline
+    python benchmark.py --baseline baseline.json     # measure and compare
+
+Every size is benchmarked on the same seeded position each run (a few random
+walls and pawn moves), so results are comparable between commits. Search
+benchmarks also report node counts, which do not depend on the machine:
+a change in nodes means the search itself changed, not just its speed.
+"""
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+from settings import *
+from board import Board
+from bitboard import BitBoard
+from player import Player
+from ai import AI
+
+BACKENDS = {'graph': Board, 'bitboard': BitBoard}
+BENCH_SIZES = (5, 7, 9, 11)
+BENCH_DEPTHS = {5: (1, 2, 3, 4), 7: (1, 2, 3, 4), 9: (1, 2, 3, 4), 11: (1, 2, 3)}
+BENCH_SEED = 2024
+BENCH_MIN_TIME = 0.3  # Seconds each primitive is timed for
+BENCH_SEARCH_RUNS = 3  # Searches are timed this many times (fastest counts)
+# Slowdowns beyond this fraction are flagged in the comparison
+BENCH_TOLERANCE = 0.10
+
+
+def make_position(board_cls, size, seed=BENCH_SEED):
+    """
+    Reproducible mid-game position: each player places size // 3 random legal
+    walls and makes one random pawn move. Candidates are sorted before the
+    draw so the position does not depend on move generation order.
+    """
+    rng = random.Random(seed * 100 + size)
+    board = board_cls(size=size)
+    mid = size // 2
+    p1 = Player((mid, size - 1), PLAYER_1_COLOR, 0, 1)
+    p2 = Player((mid, 0), PLAYER_2_COLOR, size - 1, 2)
+
+    for _ in range(size // 3):
+        for active, waiting in ((p1, p2), (p2, p1)):
+            c, r, orient = rng.choice(sorted(board.legal_walls(p1, p2)))
+            board.apply(('wall', (c, r), orient), active, waiting)
+    for active, waiting in ((p1, p2), (p2, p1)):
+        board.apply(('move', rng.choice(sorted(board.get_valid_moves(active, waiting)))), active, waiting)
+
+    board.history = []
+    return board, p1, p2
+
+
+def _ops_per_sec(fn, min_time=BENCH_MIN_TIME):
+    """Calls fn in growing batches until min_time has passed."""
+    calls, batch = 0, 1
+    start = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            fn()
+        calls += batch
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return calls / elapsed
+        batch *= 2
+
+
+def _peak_kb(fn):
+    """Peak memory allocated while running fn once."""
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def bench_primitives(board, p1, p2, min_time=BENCH_MIN_TIME):
+    ai = AI(2, seed=0, workers=1)
+    walls = board.legal_walls(p1, p2)
+    cycle = iter(())
+
+    def place_remove():
+        nonlocal cycle
+        wall = next(cycle, None)
+        if wall is None:
+            cycle = iter(walls)
+            wall = next(cycle)
+        board.place_wall(wall[0], wall[1], wall[2], p1, p2)
+        board.remove_wall(wall[0], wall[1], wall[2])
+
+    def shortest_path():
+        board.dist_maps = {}  # Measure the real search, not the cached map
+        board.get_shortest_path_len(p1.pos, p1.goal_row)
+
+    ops = {
+        'clone': board.clone,
+        'place_wall': place_remove,  # place + remove of one legal wall
+        'shortest_path': shortest_path,
+        'shortest_path_cached': lambda: board.get_shortest_path_len(p1.pos, p1.goal_row),
+        'valid_moves': lambda: board.get_valid_moves(p1, p2),
+        'all_moves': lambda: ai.get_all_moves(board, p2, p1),
+    }
+    results = {}
+    for name, fn in ops.items():
+        results[name] = {'ops_per_sec': round(_ops_per_sec(fn, min_time), 1), 'peak_kb': _peak_kb(fn)}
+    return results
+
+
+def bench_search(board, p1, p2, depth, runs=BENCH_SEARCH_RUNS):
+    """Fixed-depth get_best_move for player 2 on a fresh AI (empty TT) each run."""
+    best = None
+    for _ in range(runs):
+        ai = AI(2, seed=0, workers=1, depth=depth)
+        start = time.perf_counter()
+        ai.get_best_move(board, p1, p2, time_limit=None, node_limit=None)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best, nodes = elapsed, ai.nodes
+
+    peak = _peak_kb(lambda: AI(2, seed=0, workers=1, depth=depth).get_best_move(board, p1, p2, None, None))
+    return {'seconds': round(best, 4), 'nodes': nodes, 'nodes_per_sec': round(nodes / best, 1), 'peak_kb': peak}
+
+
+def run(backend=BOARD_BACKEND, sizes=BENCH_SIZES, quick=False):
+    board_cls = BACKENDS[backend]
+    min_time = BENCH_MIN_TIME / 3 if quick else BENCH_MIN_TIME
+    runs = 1 if quick else BENCH_SEARCH_RUNS
+    results = {}
+    for size in sizes:
+        board, p1, p2 = make_position(board_cls, size)
+        for name, res in bench_primitives(board, p1, p2, min_time).items():
+            results[f'{size}/{name}'] = res
+            print(f"{size:>2}x{size:<2} {name:<22} {res['ops_per_sec']:>12,.0f} ops/s  {res['peak_kb']:>9} KB")
+        for depth in BENCH_DEPTHS.get(size, (1, 2)):
+            res = bench_search(board, p1, p2, depth, runs)
+            results[f'{size}/search_d{depth}'] = res
+            print(f"{size:>2}x{size:<2} {'search d' + str(depth):<22} {res['nodes_per_sec']:>12,.0f} nodes/s"
+                  f"  {res['seconds']:.3f}s  {res['nodes']} nodes  {res['peak_kb']} KB")
+    return {
+        'meta': {'backend': backend, 'python': platform.python_version(),
+                 'machine': platform.machine(), 'time': time.strftime('%Y-%m-%d %H:%M:%S')},
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance=BENCH_TOLERANCE):
+    """Prints the change of every benchmark against the baseline. Returns the names that got slower."""
+    slower = []
+    print(f"\nvs baseline ({baseline['meta'].get('backend')}, {baseline['meta'].get('time')}):")
+    for name, res in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        metric = 'nodes_per_sec' if 'nodes_per_sec' in res else 'ops_per_sec'
+        change = res[metric] / old[metric] - 1 if old[metric] else 0.0
+        note = ''
+        if change < -tolerance:
+            note = '  SLOWER'
+            slower.append(name)
+        if 'nodes' in res and res['nodes'] != old['nodes']:
+            note += f"  nodes {old['nodes']} -> {res['nodes']}"
+        print(f"  {name:<26} {change:+7.1%}{note}")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Board / AI benchmarks")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=BOARD_BACKEND)
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(BENCH_SIZES))
+    parser.add_argument('--quick', action='store_true', help="shorter timings, one search run")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against a JSON file written by --save")
+    args = parser.parse_args()
+
+    current = run(args.backend, args.sizes, args.quick)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        slower = compare(current, baseline)
+        if slower:
+            print(f"{len(slower)} benchmark(s) more than {BENCH_TOLERANCE:.0%} slower than the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+from settings import *
+from board import ORIENTATIONS, wall_points, walls_at_point, goal_cells
+from zobrist import get_keys, move_delta, position_key
+
+# Per-size constant masks, built once and shared by every BitBoard of that size
+_MASKS = {}
+
+def _get_masks(size):
+    if size not in _MASKS:
+        n = size
+        rows = [((1 << n) - 1) << (r * n) for r in range(n)]
+        full = (1 << (n * n)) - 1
+        # Cells that have a neighbor below / to the right on an empty board
+        down = full & ~rows[n - 1]
+        col_last = 0
+        for r in range(n):
+            col_last |= 1 << (r * n + n - 1)
+        right = full & ~col_last
+        _MASKS[size] = (rows, down, right)
+    return _MASKS[size]
+
+# Per-(size, goal) mask of the goal cells
+_GOALS = {}
+
+def _goal_mask(size, goal):
+    if (size, goal) not in _GOALS:
+        mask = 0
+        for c, r in goal_cells(size, goal):
+            mask |= 1 << (r * size + c)
+        _GOALS[size, goal] = mask
+    return _GOALS[size, goal]
+
+# Per-size {orientation: [per slot: ((hmask, vmask) or None for a border point) x3]}
+_TOUCH = {}
+
+def _get_touch_masks(size):
+    """For each point of each wall slot, the wall bits that would touch it."""
+    if size not in _TOUCH:
+        n = size
+        table = {}
+        for orient in ORIENTATIONS:
+            slots = [None] * (n * n)
+            for r in range(n - 1):
+                for c in range(n - 1):
+                    points = []
+                    for x, y in wall_points(c, r, orient):
+                        if x == 0 or y == 0 or x == n or y == n:
+                            points.append(None)
+                            continue
+                        masks = {'H': 0, 'V': 0}
+                        for (wc, wr), wo in walls_at_point(x, y):
+                            if 0 <= wc < n - 1 and 0 <= wr < n - 1:
+                                masks[wo] |= 1 << (wr * n + wc)
+                        points.append((masks['H'], masks['V']))
+                    slots[r * n + c] = tuple(points)
+            table[orient] = slots
+        _TOUCH[size] = table
+    return _TOUCH[size]
+
+
+class BitBoard:
+    """
+    Compact board backend with the same API as board.Board.
+    Cell (c, r) is bit r*size + c. A wall slot (c, r) uses the same index
+    in h_walls / v_walls. Open edges are kept as two masks:
+      down_open  - bit i set if you can step from cell i to the cell below
+      right_open - bit i set if you can step from cell i to the cell on the right
+    so clone() only copies a handful of integers.
+    """
+    def __init__(self, size=9, h_walls=0, v_walls=0, down_open=None, right_open=None, key=0,
+                 dist_maps=None):
+        self.size = size
+        self.h_walls = h_walls
+        self.v_walls = v_walls
+
+        if down_open is None:
+            rows, down_open, right_open = _get_masks(size)
+        self.down_open = down_open
+        self.right_open = right_open
+
+        # Undo records pushed by apply(), popped by undo()
+        self.history = []
+        # Zobrist key: walls are hashed in as they are placed, pawns via reset_key()/apply()
+        self.key = key
+
+        # Distance-to-goal maps {goal: [dist per cell, -1 = blocked]}, same
+        # scheme as Board.dist_maps. The lists are never edited in place, so
+        # clones can share them.
+        self.dist_maps = dist_maps if dist_maps is not None else {}
+        # (wall, dist_maps before it) for each placed wall, newest last
+        self._map_undo = []
+
+    def to_state(self):
+        """Compact picklable snapshot, same role as Board.to_state()."""
+        return (self.size, self.h_walls, self.v_walls, self.down_open, self.right_open, self.key)
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(*state)
+
+    def clone(self):
+        """O(1) copy - a handful of integers plus the (shared, immutable) distance maps."""
+        return BitBoard(self.size, self.h_walls, self.v_walls, self.down_open, self.right_open, self.key,
+                        dict(self.dist_maps))
+
+    @property
+    def walls(self):
+        """Walls as ((c, r), orientation) tuples, same format as Board.walls."""
+        walls = []
+        for mask, orient in ((self.h_walls, 'H'), (self.v_walls, 'V')):
+            while mask:
+                low = mask & -mask
+                i = low.bit_length() - 1
+                walls.append(((i % self.size, i // self.size), orient))
+                mask ^= low
+        return walls
+
+    def has_wall(self, c, r, orientation):
+        if c < 0 or c >= self.size - 1 or r < 0 or r >= self.size - 1:
+            return False
+        mask = self.h_walls if orientation == 'H' else self.v_walls
+        return (mask >> (r * self.size + c)) & 1 == 1
+
+    def _fits(self, c, r, orientation):
+        """In range and not overlapping/crossing an existing wall."""
+        n = self.size
+        if c < 0 or c >= n - 1 or r < 0 or r >= n - 1:
+            return False
+        bit = 1 << (r * n + c)
+        if (self.h_walls | self.v_walls) & bit: return False
+        if orientation == 'H':
+            if c > 0 and self.h_walls & (bit >> 1): return False
+            if c < n - 2 and self.h_walls & (bit << 1): return False
+        else:
+            if r > 0 and self.v_walls & (bit >> n): return False
+            if r < n - 2 and self.v_walls & (bit << n): return False
+        return True
+
+    def _touch_count(self, c, r, orientation):
+        """Same as Board._touch_count, from precomputed masks."""
+        count = 0
+        for point in _get_touch_masks(self.size)[orientation][r * self.size + c]:
+            if point is None or self.h_walls & point[0] or self.v_walls & point[1]:
+                count += 1
+        return count
+
+    def is_legal_wall(self, c, r, orientation, *players):
+        """Same contract as Board.is_legal_wall()."""
+        if not self._fits(c, r, orientation): return False
+        if self._touch_count(c, r, orientation) <= 1: return True
+        if self.place_wall(c, r, orientation, *players):
+            self.remove_wall(c, r, orientation)
+            return True
+        return False
+
+    def legal_walls(self, *players, slots=None):
+        """Same contract as Board.legal_walls()."""
+        if slots is None:
+            slots = [(c, r) for c in range(self.size - 1) for r in range(self.size - 1)]
+        return [(c, r, orient) for c, r in slots for orient in ORIENTATIONS
+                if self.is_legal_wall(c, r, orient, *players)]
+
+    def place_wall(self, c, r, orientation, *players):
+        if not self._fits(c, r, orientation): return False
+        n = self.size
+        i = r * n + c
+        bit = 1 << i
+        check_paths = self._touch_count(c, r, orientation) > 1
+
+        old_down, old_right = self.down_open, self.right_open
+        if orientation == 'H':
+            self.down_open &= ~(bit | (bit << 1))
+            severed = ((i, i + n), (i + 1, i + 1 + n))
+        else:
+            self.right_open &= ~(bit | (bit << n))
+            severed = ((i, i + 1), (i + n, i + n + 1))
+
+        # Check path validity (O(1) lookups once the distance maps are updated)
+        old_maps = self.dist_maps
+        self.dist_maps = self._updated_dist_maps(severed)
+        if check_paths and not all(self.path_exists(p.pos, p.goal) for p in players):
+            self.down_open, self.right_open = old_down, old_right
+            self.dist_maps = old_maps
+            return False
+
+        if orientation == 'H':
+            self.h_walls |= bit
+        else:
+            self.v_walls |= bit
+        self._map_undo.append((((c, r), orientation), old_maps))
+        self.key ^= get_keys(n).wall[orientation][i]
+        return True
+
+    def remove_wall(self, c, r, orientation):
+        """
+        Takes a wall back off the board. Overlap rules guarantee no edge is
+        blocked by two walls, so the severed edges can simply be reopened.
+        """
+        n = self.size
+        bit = 1 << (r * n + c)
+        if orientation == 'H':
+            self.h_walls &= ~bit
+            self.down_open |= bit | (bit << 1)
+        else:
+            self.v_walls &= ~bit
+            self.right_open |= bit | (bit << n)
+        self.key ^= get_keys(n).wall[orientation][r * n + c]
+
+        wall = ((c, r), orientation)
+        if self._map_undo and self._map_undo[-1][0] == wall:
+            self.dist_maps = self._map_undo.pop()[1]
+        else:
+            self._map_undo = []
+            self.dist_maps = {}
+
+    def apply(self, move, active_player, *waiting_players):
+        """Same contract as Board.apply()."""
+        if move[0] == 'move':
+            delta = move_delta(self.size, active_player, move)
+            self.history.append((move, active_player, active_player.pos, delta))
+            active_player.move(move[1])
+            self.key ^= delta
+            return True
+
+        delta = move_delta(self.size, active_player, move)
+        (c, r), orient = move[1], move[2]
+        if not self.place_wall(c, r, orient, active_player, *waiting_players):
+            return False
+        active_player.use_wall()
+        self.history.append((move, active_player, None, delta))
+        self.key ^= delta
+        return True
+
+    def undo(self):
+        """Reverts the last apply(): pawn position or wall + wall count."""
+        move, player, prev_pos, delta = self.history.pop()
+        self.key ^= delta
+        if move[0] == 'move':
+            player.undo_move(prev_pos)
+        else:
+            self.remove_wall(move[1][0], move[1][1], move[2])
+            player.return_wall()
+
+    def reset_key(self, players, to_move):
+        """Recomputes the Zobrist key from scratch; apply()/undo() keep it current after that."""
+        self.key = position_key(self.size, self.walls, players, to_move)
+
+    def path_exists(self, start_pos, goal):
+        # Same strategy as Board.path_exists: cached map, else an early-exit BFS
+        dist = self.dist_maps.get(goal)
+        if dist is not None:
+            return dist[start_pos[1] * self.size + start_pos[0]] != -1
+        return self._path_len(start_pos, goal) != -1
+
+    def get_shortest_path_len(self, start_pos, goal):
+        """Shortest path length to the goal row/column, -1 if blocked. O(1) map lookup."""
+        return self._dist_map(goal)[start_pos[1] * self.size + start_pos[0]]
+
+    def _path_len(self, start_pos, goal):
+        """Bit-parallel BFS from one cell: every step expands the whole frontier at once."""
+        n = self.size
+        down_open, right_open = self.down_open, self.right_open
+        goal_mask = _goal_mask(n, goal)
+        frontier = 1 << (start_pos[1] * n + start_pos[0])
+        visited = frontier
+        dist = 0
+
+        while frontier:
+            if frontier & goal_mask:
+                return dist
+            step = (((frontier & down_open) << n) | ((frontier >> n) & down_open) |
+                    ((frontier & right_open) << 1) | ((frontier >> 1) & right_open))
+            frontier = step & ~visited
+            visited |= frontier
+            dist += 1
+        return -1
+
+    def _dist_map(self, goal):
+        dist = self.dist_maps.get(goal)
+        if dist is None:
+            dist = self._build_dist_map(goal)
+            self.dist_maps[goal] = dist
+        return dist
+
+    def _build_dist_map(self, goal):
+        """Same bit-parallel BFS, started from every goal cell."""
+        n = self.size
+        down_open, right_open = self.down_open, self.right_open
+        dist = [-1] * (n * n)
+        frontier = _goal_mask(n, goal)
+        visited = frontier
+        d = 0
+
+        while frontier:
+            layer = frontier
+            while layer:
+                low = layer & -layer
+                dist[low.bit_length() - 1] = d
+                layer ^= low
+            step = (((frontier & down_open) << n) | ((frontier >> n) & down_open) |
+                    ((frontier & right_open) << 1) | ((frontier >> 1) & right_open))
+            frontier = step & ~visited
+            visited |= frontier
+            d += 1
+        return dist
+
+    def _updated_dist_maps(self, severed):
+        """Same rule as Board._updated_dist_maps, on cell indices."""
+        maps = {}
+        for row, dist in self.dist_maps.items():
+            if self._map_survives(dist, severed):
+                maps[row] = dist
+        return maps
+
+    def _map_survives(self, dist, severed):
+        n = self.size
+        for u, v in severed:
+            du, dv = dist[u], dist[v]
+            if du == dv:
+                continue  # Not on any shortest path
+            far, d = (u, du) if du > dv else (v, dv)
+            c = far % n
+            if far >= n and (self.down_open >> (far - n)) & 1 and dist[far - n] == d - 1: continue
+            if (self.down_open >> far) & 1 and dist[far + n] == d - 1: continue
+            if c > 0 and (self.right_open >> (far - 1)) & 1 and dist[far - 1] == d - 1: continue
+            if (self.right_open >> far) & 1 and dist[far + 1] == d - 1: continue
+            return False
+        return True
+
+    def neighbors(self, pos):
+        """Cells reachable from pos in one step (ignoring pawns)."""
+        c, r = pos
+        n = self.size
+        i = r * n + c
+        neighbors = []
+        if r > 0 and (self.down_open >> (i - n)) & 1: neighbors.append((c, r-1))
+        if r < n-1 and (self.down_open >> i) & 1: neighbors.append((c, r+1))
+        if c > 0 and (self.right_open >> (i - 1)) & 1: neighbors.append((c-1, r))
+        if c < n-1 and (self.right_open >> i) & 1: neighbors.append((c+1, r))
+        return neighbors
+
+    def get_valid_moves(self, player, *opponents):
+        moves = []
+        current = player.pos
+        if not (0 <= current[0] < self.size and 0 <= current[1] < self.size): return [] # Safety check
+        occupied = {p.pos for p in opponents}
+
+        for neighbor in self.neighbors(current):
+            if neighbor in occupied:
+                # Jump Logic (never onto another pawn)
+                dx = neighbor[0] - current[0]
+                dy = neighbor[1] - current[1]
+                jump_dest = (neighbor[0] + dx, neighbor[1] + dy)
+
+                beyond = self.neighbors(neighbor)
+                if jump_dest in beyond and jump_dest not in occupied:
+                    moves.append(jump_dest)
+                else:
+                    for diag_neighbor in beyond:
+                        # Two blocked opponents can share a diagonal (3+ players): listed once
+                        if diag_neighbor != current and diag_neighbor not in occupied and diag_neighbor not in moves:
+                            moves.append(diag_neighbor)
+            else:
+                moves.append(neighbor)
+        return moves
@@ -1,9 +1,156 @@
 import collections
 import copy
 from settings import *
+from zobrist import get_keys, move_delta, position_key
+
+ORIENTATIONS = ('H', 'V')
+
+def wall_points(c, r, orientation):
+    """Grid-line crossings (x, y in 0..size) covered by the wall in slot (c, r)."""
+    if orientation == 'H':
+        return ((c, r+1), (c+1, r+1), (c+2, r+1))
+    return ((c+1, r), (c+1, r+1), (c+1, r+2))
+
+def severed_edges(c, r, orientation):
+    """The two cell-to-cell edges a wall in slot (c, r) blocks."""
+    if orientation == 'H':
+        return (((c, r), (c, r+1)), ((c+1, r), (c+1, r+1)))
+    return (((c, r), (c+1, r)), ((c, r+1), (c+1, r+1)))
+
+def walls_cutting(u, v):
+    """Wall slots ((c, r), orientation) that would block the step between adjacent cells u and v."""
+    if u[0] == v[0]:
+        c, r = u[0], min(u[1], v[1])
+        return (((c, r), 'H'), ((c-1, r), 'H'))
+    c, r = min(u[0], v[0]), u[1]
+    return (((c, r), 'V'), ((c, r-1), 'V'))
+
+def goal_cells(size, goal):
+    """
+    Cells of a goal. A goal is a row number (the 2-player goals) or
+    ('col', c) for the side goals of a 4-player game.
+    """
+    if isinstance(goal, tuple):
+        return [(goal[1], r) for r in range(size)]
+    return [(c, goal) for c in range(size)]
+
+def at_goal(pos, goal):
+    if isinstance(goal, tuple):
+        return pos[0] == goal[1]
+    return pos[1] == goal
+
+def path_blocking_walls(board, pos, goal):
+    """
+    Every wall slot that cuts at least one shortest path from pos to goal,
+    found by walking downhill through the board's distance map. Works with
+    either backend.
+    """
+    walls = set()
+    d = board.get_shortest_path_len(pos, goal)
+    frontier = [pos]
+    seen = {pos}
+    while d > 0:
+        d -= 1
+        next_frontier = []
+        for cell in frontier:
+            for neighbor in board.neighbors(cell):
+                if board.get_shortest_path_len(neighbor, goal) == d:
+                    walls.update(walls_cutting(cell, neighbor))
+                    if neighbor not in seen:
+                        seen.add(neighbor)
+                        next_frontier.append(neighbor)
+        frontier = next_frontier
+    return walls
+
+def path_profile(board, pos, goal):
+    """
+    (length, number of shortest paths, steps to the first bottleneck) from
+    pos to goal, from the same downhill walk as path_blocking_walls.
+    A bottleneck is a cell every shortest path goes through; the third value
+    is the path length if there is none before the goal. Length is -1
+    (and the rest 0) if the goal cannot be reached.
+    """
+    length = board.get_shortest_path_len(pos, goal)
+    if length <= 0:
+        return length, int(length == 0), 0
+    layer = {pos: 1}  # Cell -> shortest paths from pos reaching it
+    bottleneck = None
+    for d in range(length - 1, -1, -1):
+        next_layer = {}
+        for cell, paths in layer.items():
+            for neighbor in board.neighbors(cell):
+                if board.get_shortest_path_len(neighbor, goal) == d:
+                    next_layer[neighbor] = next_layer.get(neighbor, 0) + paths
+        layer = next_layer
+        if bottleneck is None and d > 0 and len(layer) == 1:
+            bottleneck = length - d
+    return length, sum(layer.values()), bottleneck if bottleneck is not None else length
+
+def shortest_path(board, pos, goal):
+    """One shortest path from pos to goal as a list of cells (pos first), [] if blocked."""
+    d = board.get_shortest_path_len(pos, goal)
+    if d < 0:
+        return []
+    path = [pos]
+    while d > 0:
+        d -= 1
+        for neighbor in board.neighbors(path[-1]):
+            if board.get_shortest_path_len(neighbor, goal) == d:
+                path.append(neighbor)
+                break
+    return path
+
+def walls_near_path(size, path, radius):
+    """
+    Candidate walls (c, r, orientation) around a path (list of cells): with
+    radius 0 the walls that cut one of its steps, otherwise every wall that
+    runs within radius - 1 cells of one of its cells. In the order found.
+    """
+    walls = []
+    seen = set()
+    if radius == 0:
+        for u, v in zip(path, path[1:]):
+            for (c, r), orient in walls_cutting(u, v):
+                if 0 <= c < size - 1 and 0 <= r < size - 1 and (c, r, orient) not in seen:
+                    seen.add((c, r, orient))
+                    walls.append((c, r, orient))
+        return walls
+    for fx, fy in path:
+        for cx in range(max(fx - radius, 0), min(fx + radius, size - 1)):
+            for cy in range(max(fy - radius, 0), min(fy + radius, size - 1)):
+                for orient in ORIENTATIONS:
+                    if (cx, cy, orient) not in seen:
+                        seen.add((cx, cy, orient))
+                        walls.append((cx, cy, orient))
+    return walls
+
+def walls_at_point(x, y):
+    """Every wall slot that covers grid-line crossing (x, y), as ((c, r), orientation)."""
+    return (((x-2, y-1), 'H'), ((x-1, y-1), 'H'), ((x, y-1), 'H'),
+            ((x-1, y-2), 'V'), ((x-1, y-1), 'V'), ((x-1, y), 'V'))
+
+def encode_move(size, move):
+    """
+    Packs an AI move tuple into one small int: pawn moves are the target cell
+    index (0 .. size*size-1), walls follow as size*size + 2*slot + (1 if 'V').
+    Fits in 16 bits for every supported board size.
+    """
+    if move[0] == 'move':
+        c, r = move[1]
+        return r * size + c
+    (c, r), orient = move[1], move[2]
+    return size * size + 2 * (r * size + c) + (orient == 'V')
+
+def decode_move(size, code):
+    """Inverse of encode_move."""
+    cells = size * size
+    if code < cells:
+        return ('move', (code % size, code // size))
+    slot, vertical = divmod(code - cells, 2)
+    return ('wall', (slot % size, slot // size), 'V' if vertical else 'H')
 
 class Board:
-    def __init__(self, size=9, graph=None, walls=None):
+    def __init__(self, size=9, graph=None, walls=None, wall_edges=None, key=0, dist_maps=None):
         self.size = size
 
         if graph:
@@ -13,6 +160,21 @@ class Board:
             self._init_graph()
 
         self.walls = walls if walls is not None else []
+        # Occupancy set mirroring self.walls for O(1) overlap checks
+        self.wall_set = set(self.walls)
+        # Edges severed by each placed wall, so remove_wall() can put them back
+        self.wall_edges = wall_edges if wall_edges is not None else {}
+        # Undo records pushed by apply(), popped by undo()
+        self.history = []
+        # Zobrist key: walls are hashed in as they are placed, pawns via reset_key()/apply()
+        self.key = key
+
+        # Distance-to-goal maps {goal: {cell: dist}}, built lazily by a
+        # reverse BFS from the goal cells. Maps are never edited in place; a wall
+        # that changes one swaps in a new dict, so old ones can be restored.
+        self.dist_maps = dist_maps if dist_maps is not None else {}
+        # (wall, dist_maps before it) for each placed wall, newest last
+        self._map_undo = []
 
     def _init_graph(self):
         for c in range(self.size):
@@ -24,37 +186,87 @@ class Board:
                 if c < self.size-1: neighbors.append((c+1, r))
                 self.graph[(c, r)] = neighbors
 
+    def to_state(self):
+        """Compact picklable snapshot (size + walls), e.g. for search worker processes."""
+        return (self.size, tuple(self.walls))
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuilds a board from to_state(). Walls are trusted, not re-checked."""
+        size, walls = state
+        board = cls(size)
+        for (c, r), orientation in walls:
+            wall = ((c, r), orientation)
+            board.wall_edges[wall] = [(u, v) for u, v in severed_edges(c, r, orientation)
+                                      if v in board.graph[u]]
+            for u, v in board.wall_edges[wall]:
+                board.graph[u].remove(v)
+                board.graph[v].remove(u)
+            board.walls.append(wall)
+            board.wall_set.add(wall)
+            board.key ^= get_keys(size).wall[orientation][r * size + c]
+        return board
+
     def clone(self):
         """Creates a deep copy of the board for AI simulation."""
         # We must deepcopy the graph because lists (neighbors) are mutable
-        return Board(self.size, copy.deepcopy(self.graph), copy.deepcopy(self.walls))
+        return Board(self.size, copy.deepcopy(self.graph), copy.deepcopy(self.walls),
+                     copy.deepcopy(self.wall_edges), self.key, dict(self.dist_maps))
+
+    def has_wall(self, c, r, orientation):
+        return ((c, r), orientation) in self.wall_set
 
-    def place_wall(self, c, r, orientation, p1, p2):
+    def _fits(self, c, r, orientation):
+        """In range and not overlapping/crossing an existing wall (O(1))."""
         if c < 0 or c >= self.size - 1 or r < 0 or r >= self.size - 1:
             return False
+        if self.has_wall(c, r, 'H') or self.has_wall(c, r, 'V'): return False
+        if orientation == 'H':
+            return not (self.has_wall(c+1, r, 'H') or self.has_wall(c-1, r, 'H'))
+        return not (self.has_wall(c, r+1, 'V') or self.has_wall(c, r-1, 'V'))
 
-        new_wall = ((c, r), orientation)
-        if new_wall in self.walls: return False
+    def _touch_count(self, c, r, orientation):
+        """How many of the wall's three points touch the border or another wall."""
+        n = self.size
+        count = 0
+        for x, y in wall_points(c, r, orientation):
+            if x == 0 or y == 0 or x == n or y == n:
+                count += 1
+            elif any(self.has_wall(wc, wr, wo) for (wc, wr), wo in walls_at_point(x, y)):
+                count += 1
+        return count
 
-        # Check overlaps
-        if orientation == 'H':
-            if ((c, r), 'V') in self.walls: return False
-            if ((c+1, r), 'H') in self.walls: return False
-            if ((c-1, r), 'H') in self.walls: return False
-        else: 
-            if ((c, r), 'H') in self.walls: return False
-            if ((c, r+1), 'V') in self.walls: return False
-            if ((c, r-1), 'V') in self.walls: return False
+    def is_legal_wall(self, c, r, orientation, *players):
+        """place_wall() legality without changing the board."""
+        if not self._fits(c, r, orientation): return False
+        # A wall that touches the border/other walls in at most one point
+        # cannot close off any region, so it needs no path search
+        if self._touch_count(c, r, orientation) <= 1: return True
+        if self.place_wall(c, r, orientation, *players):
+            self.remove_wall(c, r, orientation)
+            return True
+        return False
+
+    def legal_walls(self, *players, slots=None):
+        """
+        Every legal placement as (c, r, orientation), in one batched call.
+        `slots` optionally restricts the search to some (c, r) slots.
+        """
+        if slots is None:
+            slots = [(c, r) for c in range(self.size - 1) for r in range(self.size - 1)]
+        return [(c, r, orient) for c, r in slots for orient in ORIENTATIONS
+                if self.is_legal_wall(c, r, orient, *players)]
+
+    def place_wall(self, c, r, orientation, *players):
+        """Places the wall if it fits and leaves every player a path to its goal."""
+        if not self._fits(c, r, orientation): return False
+        new_wall = ((c, r), orientation)
+        check_paths = self._touch_count(c, r, orientation) > 1
 
         # Temporarily remove edges
         removed_edges = []
-        if orientation == 'H':
-            nodes_to_sever = [((c, r), (c, r+1)), ((c+1, r), (c+1, r+1))]
-        else:
-            nodes_to_sever = [((c, r), (c+1, r)), ((c, r+1), (c+1, r+1))]
-
         try:
-            for u, v in nodes_to_sever:
+            for u, v in severed_edges(c, r, orientation):
                 if v in self.graph[u]:
                     self.graph[u].remove(v)
                     self.graph[v].remove(u)
@@ -63,30 +275,99 @@ class Board:
             self._restore_edges(removed_edges)
             return False
 
-        # Check path validity
-        if self.path_exists(p1.pos, p1.goal_row) and self.path_exists(p2.pos, p2.goal_row):
+        # Check path validity (O(1) lookups once the distance maps are updated;
+        # skipped when the wall cannot disconnect anything)
+        old_maps = self.dist_maps
+        self.dist_maps = self._updated_dist_maps(removed_edges)
+        if not check_paths or all(self.path_exists(p.pos, p.goal) for p in players):
             self.walls.append(new_wall)
+            self.wall_set.add(new_wall)
+            self.wall_edges[new_wall] = removed_edges
+            self._map_undo.append((new_wall, old_maps))
+            self.key ^= get_keys(self.size).wall[orientation][r * self.size + c]
             return True
         else:
             self._restore_edges(removed_edges)
+            self.dist_maps = old_maps
+            return False
+
+    def remove_wall(self, c, r, orientation):
+        """Takes a wall back off the board and restores the edges it severed."""
+        wall = ((c, r), orientation)
+        self.walls.remove(wall)
+        self.wall_set.discard(wall)
+        self._restore_edges(self.wall_edges.pop(wall))
+        self.key ^= get_keys(self.size).wall[orientation][r * self.size + c]
+
+        # Undoing the latest wall (the search always does) gets the old maps back
+        # for free; anything else just forces a lazy rebuild
+        if self._map_undo and self._map_undo[-1][0] == wall:
+            self.dist_maps = self._map_undo.pop()[1]
+        else:
+            self._map_undo = []
+            self.dist_maps = {}
+
+    def apply(self, move, active_player, *waiting_players):
+        """
+        Plays an AI move tuple ('move', pos) or ('wall', (c, r), orient) in place
+        and records it so undo() can take it back. Returns False (and records
+        nothing) if the wall is illegal.
+        """
+        if move[0] == 'move':
+            delta = move_delta(self.size, active_player, move)
+            self.history.append((move, active_player, active_player.pos, delta))
+            active_player.move(move[1])
+            self.key ^= delta
+            return True
+
+        delta = move_delta(self.size, active_player, move)
+        (c, r), orient = move[1], move[2]
+        if not self.place_wall(c, r, orient, active_player, *waiting_players):
             return False
+        active_player.use_wall()
+        self.history.append((move, active_player, None, delta))
+        self.key ^= delta
+        return True
+
+    def undo(self):
+        """Reverts the last apply(): pawn position or wall + wall count."""
+        move, player, prev_pos, delta = self.history.pop()
+        self.key ^= delta
+        if move[0] == 'move':
+            player.undo_move(prev_pos)
+        else:
+            self.remove_wall(move[1][0], move[1][1], move[2])
+            player.return_wall()
+
+    def reset_key(self, players, to_move):
+        """Recomputes the Zobrist key from scratch; apply()/undo() keep it current after that."""
+        self.key = position_key(self.size, self.walls, players, to_move)
 
     def _restore_edges(self, edges):
         for u, v in edges:
             self.graph[u].append(v)
             self.graph[v].append(u)
 
-    def path_exists(self, start_pos, target_row):
-        return self.get_shortest_path_len(start_pos, target_row) != -1
+    def path_exists(self, start_pos, goal):
+        # A cached map answers in O(1). Without one, a BFS that stops at the
+        # goal is cheaper than building the whole map (and place_wall
+        # often tests walls that are taken straight back)
+        dist = self.dist_maps.get(goal)
+        if dist is not None:
+            return start_pos in dist
+        return self._bfs_len(start_pos, goal) != -1
+
+    def get_shortest_path_len(self, start_pos, goal):
+        """Shortest path length to the goal row/column, -1 if blocked. Used by AI Heuristic."""
+        return self._dist_map(goal).get(start_pos, -1)
 
-    def get_shortest_path_len(self, start_pos, target_row):
-        """BFS to find shortest path length. Used by AI Heuristic."""
+    def _bfs_len(self, start_pos, goal):
         queue = collections.deque([(start_pos, 0)])
         visited = {start_pos}
 
         while queue:
             current, dist = queue.popleft()
-            if current[1] == target_row:
+            if at_goal(current, goal):
                 return dist
 
             for neighbor in self.graph[current]:
@@ -95,24 +376,85 @@ class Board:
                     queue.append((neighbor, dist + 1))
         return -1
 
-    def get_valid_moves(self, player, opponent):
+    def _dist_map(self, goal):
+        dist = self.dist_maps.get(goal)
+        if dist is None:
+            dist = self._build_dist_map(goal)
+            self.dist_maps[goal] = dist
+        return dist
+
+    def _build_dist_map(self, goal):
+        """Reverse BFS from every cell of the goal."""
+        dist = {}
+        queue = collections.deque()
+        for cell in goal_cells(self.size, goal):
+            dist[cell] = 0
+            queue.append(cell)
+
+        while queue:
+            current = queue.popleft()
+            d = dist[current] + 1
+            for neighbor in self.graph[current]:
+                if neighbor not in dist:
+                    dist[neighbor] = d
+                    queue.append(neighbor)
+        return dist
+
+    def _updated_dist_maps(self, severed):
+        """
+        Distance maps after the `severed` edges were cut from the graph.
+        A map survives unless a cut edge was the only downhill step left for
+        its far end; in that case it is dropped and rebuilt on the next query.
+        """
+        maps = {}
+        for row, dist in self.dist_maps.items():
+            if self._map_survives(dist, severed):
+                maps[row] = dist
+        return maps
+
+    def _map_survives(self, dist, severed):
+        for u, v in severed:
+            # u and v were adjacent, so both are reachable or neither is
+            du, dv = dist.get(u), dist.get(v)
+            if du == dv:
+                continue  # Not on any shortest path
+            far, d = (u, du) if du > dv else (v, dv)
+            if not any(dist.get(nb) == d - 1 for nb in self.graph[far]):
+                return False
+        return True
+
+    def neighbors(self, pos):
+        """Cells reachable from pos in one step (ignoring pawns)."""
+        return self.graph[pos]
+
+    def get_valid_moves(self, player, *opponents):
         moves = []
         current = player.pos
         if current not in self.graph: return [] # Safety check
+        occupied = {p.pos for p in opponents}
 
         for neighbor in self.graph[current]:
-            if neighbor == opponent.pos:
-                # Jump Logic
+            if neighbor in occupied:
+                # Jump Logic (never onto another pawn)
                 dx = neighbor[0] - current[0]
                 dy = neighbor[1] - current[1]
                 jump_dest = (neighbor[0] + dx, neighbor[1] + dy)
 
-                if jump_dest in self.graph[neighbor]:
+                if jump_dest in self.graph[neighbor] and jump_dest not in occupied:
                     moves.append(jump_dest)
                 else:
                     for diag_neighbor in self.graph[neighbor]:
-                        if diag_neighbor != current:
+                        # Two blocked opponents can share a diagonal (3+ players): listed once
+                        if diag_neighbor != current and diag_neighbor not in occupied and diag_neighbor not in moves:
                             moves.append(diag_neighbor)
             else:
                 moves.append(neighbor)
         return moves
+
+
+def new_board(size=BOARD_SIZE):
+    """Builds an empty board using the backend selected in settings.py."""
+    if BOARD_BACKEND == 'bitboard':
+        from bitboard import BitBoard
+        return BitBoard(size=size)
+    return Board(size=size)
@@ -0,0 +1,171 @@
+"""
+Opening book: best moves for the first plies of a game, searched offline.
+
+    python book.py --sizes 5 7 9 11 --plies 6 --depth 5
+
+The file is a header followed by fixed-size records sorted by Zobrist key:
+    b'QBK1', uint32 record count,
+    then per record: uint64 position key, uint16 move (board.encode_move)
+It is memory-mapped and binary searched, so loading costs nothing and a
+lookup touches a handful of records. Keys already cover the board size
+(zobrist keys are seeded per size), so one file holds every size.
+"""
+import argparse
+import mmap
+import os
+import struct
+import time
+from settings import *
+from board import new_board, encode_move, decode_move
+from player import Player
+from paths import data_path
+
+BOOK_MAGIC = b'QBK1'
+_HEADER = struct.Struct('<4sI')
+_RECORD = struct.Struct('<QH')
+
+_BOOKS = {}
+
+
+class KeyFile:
+    """
+    Read-only, memory-mapped file of fixed-size records sorted by a leading
+    uint64 key: a 4-byte magic and a uint32 count, then the records. Shared
+    by the opening book and the endgame tablebase.
+    """
+    def __init__(self, path, magic, record):
+        self.path = path
+        self.record = record
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        file_magic, self.count = _HEADER.unpack_from(self.data, 0)
+        if file_magic != magic:
+            raise ValueError(f"{path} is not a {magic.decode()} file")
+
+    def __len__(self):
+        return self.count
+
+    def find(self, key):
+        """The record (key, ...) with this key, or None. Binary search in place."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            rec = self.record.unpack_from(self.data, _HEADER.size + mid * self.record.size)
+            if rec[0] == key:
+                return rec
+            if rec[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def close(self):
+        self.data.close()
+
+
+def write_records(path, magic, record, entries):
+    """
+    entries: {key: tuple of the other record fields}. Written to a temp
+    file first, so a loaded file is never half-written.
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(magic, len(entries)))
+        for key in sorted(entries):
+            f.write(record.pack(key, *entries[key]))
+    os.replace(tmp, path)
+
+
+class OpeningBook(KeyFile):
+    """Read-only view of a book file."""
+    def __init__(self, path):
+        super().__init__(path, BOOK_MAGIC, _RECORD)
+
+    def lookup(self, key, size):
+        """Book move for the position with this Zobrist key, or None."""
+        rec = self.find(key)
+        return decode_move(size, rec[1]) if rec is not None else None
+
+
+def get_book(path=BOOK_PATH):
+    """The book at path, opened once per process. None if there is no book file."""
+    path = data_path(path)
+    if path not in _BOOKS:
+        _BOOKS[path] = OpeningBook(path) if os.path.exists(path) else None
+    return _BOOKS[path]
+
+
+def write_book(path, entries):
+    """entries: {key: encoded move}."""
+    write_records(path, BOOK_MAGIC, _RECORD, {key: (code,) for key, code in entries.items()})
+
+
+def build(sizes, plies=BOOK_PLIES, depth=BOOK_DEPTH, width=BOOK_WIDTH):
+    """
+    Searches every position reachable in `plies` plies from the start of each
+    board size, where each side plays its best move or one of the next
+    `width - 1` moves in search order (the likely alternatives). Returns
+    {key: encoded best move}.
+    """
+    from ai import AI
+
+    entries = {}
+    for size in sizes:
+        board = new_board(size)
+        mid = size // 2
+        p1 = Player((mid, size - 1), PLAYER_1_COLOR, 0, 1)
+        p2 = Player((mid, 0), PLAYER_2_COLOR, size - 1, 2)
+        agents = {1: AI(1, seed=0, workers=1, depth=depth), 2: AI(2, seed=0, workers=1, depth=depth)}
+        # The book must not answer from itself while it is being built
+        for agent in agents.values():
+            agent.book = None
+
+        start = time.perf_counter()
+        found = _expand(board, p1, p2, 1, plies, width, agents, entries)
+        print(f"{size}x{size}: {found} positions in {time.perf_counter() - start:.1f}s")
+    return entries
+
+
+def _expand(board, p1, p2, turn, plies_left, width, agents, entries):
+    active, waiting = (p1, p2) if turn == 1 else (p2, p1)
+    board.reset_key((p1, p2), active)
+    if board.key in entries:
+        return 0
+
+    agent = agents[turn]
+    best = agent.get_best_move(board, p1, p2, time_limit=None, node_limit=None)
+    if best is None:
+        return 0
+    entries[board.key] = encode_move(board.size, best)
+    found = 1
+    if plies_left <= 1:
+        return found
+
+    # Best move first, then the alternatives the move ordering rates highest
+    moves = agent.get_all_moves(board, active, waiting)
+    agent._order_moves(board, moves, active, waiting, 0, best)
+    for move in moves[:width]:
+        board.apply(move, active, waiting)
+        if active.pos[1] != active.goal_row:
+            found += _expand(board, p1, p2, 3 - turn, plies_left - 1, width, agents, entries)
+        board.undo()
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the opening book")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 7, 9, 11])
+    parser.add_argument('--plies', type=int, default=BOOK_PLIES, help="plies from the start position covered")
+    parser.add_argument('--depth', type=int, default=BOOK_DEPTH, help="search depth per book position")
+    parser.add_argument('--width', type=int, default=BOOK_WIDTH, help="moves followed per position")
+    parser.add_argument('--out', default=BOOK_PATH)
+    args = parser.parse_args()
+
+    entries = build(args.sizes, args.plies, args.depth, args.width)
+    path = data_path(args.out)
+    write_book(path, entries)
+    print(f"{len(entries)} positions -> {path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
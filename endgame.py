@@ -0,0 +1,281 @@
+"""
+Exact play once walls are out of the game.
+
+With no walls left for either player the wall layout is frozen and only the
+two pawns move, so the whole game fits in a small graph of states
+(pawn of player 0, pawn of player 1, side to move). EndgameSolver solves that
+graph by retrograde analysis: a side to move whose opponent already stands on
+its goal row has lost, a state with a move into a lost state is won, and a
+state whose moves all lead to won states is lost. Every state gets its exact
+result and the number of plies until the game ends.
+
+If only one side has walls left, the race still gives a bound: the side with
+walls can simply stop placing them, so if it wins the race it wins the game.
+
+Solving is bounded: solve() gives up (returns None) on boards whose race can
+have more than ENDGAME_MAX_STATES states, past a deadline or when a
+stop_event is set. A layout that ran out of time is not tried again.
+
+Precomputed results for small boards can be stored in a tablebase file:
+
+    python endgame.py --sizes 5 7 --layouts 200
+"""
+import argparse
+import collections
+import heapq
+import os
+import random
+import struct
+import time
+from settings import *
+from board import new_board, encode_move, decode_move
+from book import KeyFile, write_records
+from paths import data_path
+from player import Player
+from zobrist import pawn_slot, position_key
+
+# Results, from the point of view of the side to move
+WIN = 1
+DRAW = 0  # Never resolved; only possible if both sides can shuffle forever
+LOSS = -1
+
+TABLEBASE_MAGIC = b'QEG1'
+# key, plies with the sign of the result (+n win in n, -n loss in n, 0 draw), move
+_TB_RECORD = struct.Struct('<QhH')
+
+# States handled between two looks at the deadline / stop_event
+_CHECK_EVERY = 1024
+
+_TABLEBASES = {}
+
+
+class EndgameSolver:
+    """
+    Solves pawn races and keeps the solved table of the current wall layout:
+    {(size, walls): {(pos0, pos1, mover): (result, plies, best move)}}
+    where pos0/pos1 are the pawns keyed by zobrist.pawn_slot. The table
+    answers every later move until a wall is placed; walls never come off,
+    so the tables of older layouts are dropped then.
+    """
+    def __init__(self, tablebase=None):
+        self.tables = {}
+        self.tablebase = tablebase
+        self.solved = 0  # States solved by this solver (all tables)
+
+    def solve(self, board, mover, other, deadline=None, stop_event=None, max_states=ENDGAME_MAX_STATES):
+        """
+        (result, plies, best move) for `mover` to play in the current
+        position, treating it as a pure pawn race. Solves the layout on the
+        first call; afterwards every position of the race is a dict lookup.
+        None if the solve was given up (deadline, stop_event, max_states).
+        """
+        state = self._state(mover, other)
+        table = self._table(board)
+        if table is None:
+            return None  # Ran out of time on this layout before
+        entry = table.get(state)
+        if entry is None:
+            entry = self._from_tablebase(board, mover, other)
+            if entry is None:
+                cells = board.size * board.size
+                if max_states is not None and 2 * cells * (cells - 1) > max_states:
+                    return None
+                if not self._solve_from(board, table, [state], deadline, stop_event):
+                    if stop_event is None or not stop_event.is_set():
+                        self.tables[(board.size, frozenset(board.walls))] = None
+                    return None
+                entry = table[state]
+        return entry
+
+    def _table(self, board):
+        """The table of board's wall layout, None if solving it was given up."""
+        layout = (board.size, frozenset(board.walls))
+        if layout not in self.tables:
+            self.tables = {layout: {}}
+        return self.tables[layout]
+
+    def _state(self, mover, other):
+        if pawn_slot(mover) == 0:
+            return (mover.pos, other.pos, 0)
+        return (other.pos, mover.pos, 1)
+
+    def _from_tablebase(self, board, mover, other):
+        if self.tablebase is None:
+            return None
+        # Tablebase keys are full position keys with no walls left in hand
+        players = [self._racer(mover, mover.pos), self._racer(other, other.pos)]
+        rec = self.tablebase.find(position_key(board.size, board.walls, players, players[0]))
+        if rec is None:
+            return None
+        _, signed, code = rec
+        result = WIN if signed > 0 else LOSS if signed < 0 else DRAW
+        return result, abs(signed), decode_move(board.size, code)
+
+    def _racer(self, player, pos):
+        p = Player(pos, player.color, player.goal_row, player.id)
+        p.walls_remaining = 0
+        return p
+
+    def _solve_from(self, board, table, roots, deadline=None, stop_event=None):
+        """
+        Retrograde analysis of every state reachable from roots (pawn moves
+        only). Results go into table; states already in it are not redone.
+        False, with table untouched, if it ran out of time or was stopped.
+        """
+        def out_of_budget(handled):
+            if handled % _CHECK_EVERY:
+                return False
+            if deadline is not None and time.perf_counter() > deadline:
+                return True
+            return stop_event is not None and stop_event.is_set()
+
+        goal = {0: 0, 1: board.size - 1}  # Goal row per pawn slot
+        racers = {0: Player(None, None, goal[0], 0), 1: Player(None, None, goal[1], 1)}
+
+        # 1. Forward: collect states, their moves and predecessors
+        moves = {}
+        preds = collections.defaultdict(list)
+        queue = collections.deque(s for s in roots if s not in table)
+        seen = set(queue)
+        done = []  # Heap of (plies, result, state) still to propagate
+        while queue:
+            if out_of_budget(len(moves)):
+                return False
+            state = queue.popleft()
+            pos = state[:2]
+            m = state[2]
+            if pos[1 - m][1] == goal[1 - m]:
+                done.append((0, LOSS, state))  # The side that just moved has won
+                continue
+            racers[m].pos, racers[1 - m].pos = pos[m], pos[1 - m]
+            children = []
+            for dest in board.get_valid_moves(racers[m], racers[1 - m]):
+                child = (dest, pos[1], 1) if m == 0 else (pos[0], dest, 0)
+                children.append((dest, child))
+                preds[child].append(state)
+                if child not in seen and child not in table:
+                    seen.add(child)
+                    queue.append(child)
+            moves[state] = children
+
+        # States solved earlier (from another root) feed in with their result.
+        # Draws stay unresolved, which is what they are
+        for state in preds:
+            if state in table and table[state][0] != DRAW:
+                done.append((table[state][1], table[state][0], state))
+
+        # 2. Backward, in order of plies: the first resolution of a win is the
+        # fastest one, the move that finally resolves a loss is the slowest one
+        remaining = {state: len(children) for state, children in moves.items()}
+        result = {state: (res, plies) for plies, res, state in done}
+        heapq.heapify(done)
+        popped = 0
+        while done:
+            popped += 1
+            if out_of_budget(popped):
+                return False
+            plies, res, state = heapq.heappop(done)
+            for pred in preds.get(state, ()):
+                if pred in result:
+                    continue
+                if res == LOSS:
+                    result[pred] = (WIN, plies + 1)
+                    heapq.heappush(done, (plies + 1, WIN, pred))
+                else:
+                    remaining[pred] -= 1
+                    if remaining[pred] == 0:
+                        result[pred] = (LOSS, plies + 1)
+                        heapq.heappush(done, (plies + 1, LOSS, pred))
+
+        # 3. Best move per state
+        for state, children in moves.items():
+            res, plies = result.get(state, (DRAW, 0))
+            best = None
+            for dest, child in children:
+                child_res, child_plies = result.get(child) or table.get(child, (DRAW, 0))[:2]
+                if res == WIN and child_res == LOSS and child_plies == plies - 1:
+                    best = dest
+                    break
+                if res == LOSS and child_plies == plies - 1:
+                    best = dest
+                    break
+                if res == DRAW and child_res == DRAW:
+                    best = dest
+                    break
+            if best is None and children:
+                best = children[0][0]
+            table[state] = (res, plies, ('move', best) if best is not None else None)
+        for state, (res, plies) in result.items():
+            if state not in table:
+                table[state] = (res, plies, None)  # Terminal
+        self.solved += len(moves)
+        return True
+
+
+def get_tablebase(path=TABLEBASE_PATH):
+    """The tablebase at path, opened once per process. None if there is no file."""
+    path = data_path(path)
+    if path not in _TABLEBASES:
+        _TABLEBASES[path] = KeyFile(path, TABLEBASE_MAGIC, _TB_RECORD) if os.path.exists(path) else None
+    return _TABLEBASES[path]
+
+
+def build_tablebase(sizes, layouts, seed=0):
+    """
+    Solves every pawn placement (both sides to move) of `layouts` random
+    wall layouts per size: walls are placed at random, alternating sides,
+    until both players have used all theirs or no legal wall is left.
+    Returns {key: (signed plies, move code)}.
+    """
+    rng = random.Random(seed)
+    entries = {}
+    for size in sizes:
+        start = time.perf_counter()
+        for _ in range(layouts):
+            board = new_board(size)
+            mid = size // 2
+            p1 = Player((mid, size - 1), PLAYER_1_COLOR, 0, 1)
+            p2 = Player((mid, 0), PLAYER_2_COLOR, size - 1, 2)
+            active, waiting = p1, p2
+            while active.walls_remaining > 0:
+                legal = board.legal_walls(p1, p2)
+                if not legal:
+                    break
+                c, r, orient = rng.choice(legal)
+                board.apply(('wall', (c, r), orient), active, waiting)
+                active, waiting = waiting, active
+
+            cells = [(c, r) for r in range(size) for c in range(size)]
+            roots = [(a, b, m) for a in cells for b in cells if a != b for m in (0, 1)]
+            solver = EndgameSolver()
+            table = solver._table(board)
+            solver._solve_from(board, table, roots)
+            racers = {0: Player(None, None, 0, 1), 1: Player(None, None, size - 1, 2)}
+            for p in racers.values():
+                p.walls_remaining = 0
+            for (pos0, pos1, m), (res, plies, move) in table.items():
+                if move is None:
+                    continue
+                racers[0].pos, racers[1].pos = pos0, pos1
+                key = position_key(size, board.walls, (racers[0], racers[1]), racers[m])
+                entries[key] = (res * plies, encode_move(size, move))
+        print(f"{size}x{size}: {layouts} layouts in {time.perf_counter() - start:.1f}s")
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the endgame tablebase")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 7])
+    parser.add_argument('--layouts', type=int, default=100, help="random wall layouts per size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=TABLEBASE_PATH)
+    args = parser.parse_args()
+
+    entries = build_tablebase(args.sizes, args.layouts, args.seed)
+    path = data_path(args.out)
+    write_records(path, TABLEBASE_MAGIC, _TB_RECORD, entries)
+    print(f"{len(entries)} positions -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Opt-in instrumentation of AI.get_best_move.
+
+With AI_INSTRUMENT on (or an AI_STATS_LOG file set), every move the AI picks
+leaves a SearchStats in ai.last_stats, and is appended to the log as one
+JSON line:
+
+    {"player": 2, "size": 9, "source": "search", "move": ["wall", [3, 4], "H"],
+     "seconds": 0.61, "nodes": 3917, "counters": {"clones": 1, "bfs": 210, ...},
+     "phases": {"setup": 0.0, "movegen": 0.002, ...}, "depths": [...], "tt": {...}}
+
+Board calls are counted by shadowing methods of the AI's private copy of the
+board, so an AI with instrumentation off runs exactly the code it did before.
+counters also holds wall_checks_skipped: candidate walls the search never had
+to check for legality because a cutoff came first (AI.staged_moves).
+Workers of the root-parallel search report their nodes but not their board
+calls.
+
+profile_move() runs cProfile or a sampling profiler around one move:
+
+    with profile_move('sample') as prof:
+        ai.get_best_move(board, p1, p2)
+    print(prof.report())
+
+Profile one move of the benchmark position from the command line:
+
+    python instrument.py --size 9 --depth 4 --profile cprofile
+"""
+import argparse
+import collections
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+from settings import *
+
+# Counter name -> board methods that count towards it (either backend)
+BOARD_COUNTERS = {
+    'clones': ('clone',),
+    'bfs': ('_bfs_len', '_path_len', '_build_dist_map'),
+    'wall_checks': ('is_legal_wall',),
+    'wall_placements': ('place_wall',),  # Includes the trial placements of is_legal_wall
+}
+
+# Seconds between two stack samples of the sampling profiler
+PROFILE_INTERVAL = 0.001
+
+
+def count_board_calls(board, counters):
+    """Counts calls of the BOARD_COUNTERS methods on this one board instance into counters."""
+    for counter, names in BOARD_COUNTERS.items():
+        counters.setdefault(counter, 0)
+        for name in names:
+            method = getattr(board, name, None)
+            if method is not None:
+                setattr(board, name, _counted(method, counters, counter))
+
+
+def _counted(method, counters, counter):
+    def counted(*args, **kwargs):
+        counters[counter] += 1
+        return method(*args, **kwargs)
+    return counted
+
+
+class SearchStats:
+    """
+    What one get_best_move did. `phases` holds wall time per phase (setup,
+    book, ponder, endgame, movegen, order, search), `depths` one entry per
+    iterative deepening iteration, `counters` the board calls.
+    """
+    def __init__(self, player_id, size):
+        self.player = player_id
+        self.size = size
+        self.started = time.perf_counter()
+        self._mark = self.started
+        self.phases = {}
+        self.depths = []
+        self.counters = {'clones': 1}  # The private copy of the live board
+        self.source = None
+        self.move = None
+        self.seconds = 0.0
+        self.nodes = 0
+        self.cutoffs = 0
+        self.tt = None
+        self._nodes = 0
+        self._cutoffs = 0
+
+    def lap(self, phase):
+        """Adds the time since the previous lap to `phase`; returns it."""
+        now = time.perf_counter()
+        elapsed = now - self._mark
+        self._mark = now
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+        return elapsed
+
+    def end_depth(self, depth, nodes, cutoffs, move=None, score=None, completed=True):
+        """Closes one iteration; nodes / cutoffs are the AI's running totals."""
+        self.depths.append({
+            'depth': depth,
+            'completed': completed,
+            'seconds': round(self.lap('search'), 6),
+            'nodes': nodes - self._nodes,
+            'cutoffs': cutoffs - self._cutoffs,
+            'move': move,
+            'score': score,
+        })
+        self._nodes, self._cutoffs = nodes, cutoffs
+
+    def finish(self, move, source, nodes, cutoffs, tt=None):
+        self.seconds = time.perf_counter() - self.started
+        self.move = move
+        self.source = source
+        self.nodes = nodes
+        self.cutoffs = cutoffs
+        self.tt = tt
+
+    def to_dict(self):
+        return {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'player': self.player,
+            'size': self.size,
+            'source': self.source,
+            'move': self.move,
+            'seconds': round(self.seconds, 6),
+            'nodes': self.nodes,
+            'nodes_per_sec': round(self.nodes / self.seconds, 1) if self.seconds else 0.0,
+            'cutoffs': self.cutoffs,
+            'counters': dict(self.counters),
+            'phases': {name: round(t, 6) for name, t in self.phases.items()},
+            'depths': self.depths,
+            'tt': self.tt,
+        }
+
+    def write(self, path):
+        """Appends the stats to a JSON lines file."""
+        with open(path, 'a') as f:
+            f.write(json.dumps(self.to_dict()) + '\n')
+
+
+class profile_move:
+    """
+    Context manager profiling the code it wraps (one AI move):
+        'cprofile'  deterministic, every call counted, slows the search down
+        'sample'    looks at the calling thread's stack every `interval`
+                    seconds from a helper thread; cheap, statistical
+    report() returns the top functions as text; with a `path` the cProfile
+    data (for pstats / snakeviz) or the sample report is also written there.
+    """
+    def __init__(self, kind='cprofile', path=None, interval=PROFILE_INTERVAL):
+        if kind not in ('cprofile', 'sample'):
+            raise ValueError(f"unknown profiler {kind!r}")
+        self.kind = kind
+        self.path = path
+        self.interval = interval
+        self.profile = None
+        self.samples = 0
+        self.own = collections.Counter()
+        self.total = collections.Counter()
+        self._stop = None
+        self._thread = None
+
+    def __enter__(self):
+        if self.kind == 'cprofile':
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._sample, args=(threading.get_ident(),), daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.kind == 'cprofile':
+            self.profile.disable()
+            if self.path:
+                self.profile.dump_stats(self.path)
+        else:
+            self._stop.set()
+            self._thread.join()
+            if self.path:
+                with open(self.path, 'w') as f:
+                    f.write(self.report(limit=None))
+        return False
+
+    def _sample(self, thread_id):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.own[_where(frame)] += 1
+            # A recursive function counts once per sample
+            seen = set()
+            while frame is not None:
+                seen.add(_where(frame))
+                frame = frame.f_back
+            self.total.update(seen)
+
+    def report(self, limit=20):
+        if self.kind == 'cprofile':
+            out = io.StringIO()
+            pstats.Stats(self.profile, stream=out).sort_stats('cumulative').print_stats(limit)
+            return out.getvalue()
+        lines = [f"{self.samples} samples every {self.interval * 1000:g} ms",
+                 f"{'own':>6} {'total':>6}  function"]
+        for where, n in self.own.most_common(limit):
+            lines.append(f"{n / self.samples:6.1%} {self.total[where] / self.samples:6.1%}  {where}")
+        return '\n'.join(lines)
+
+
+def _where(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+
+def main():
+    from benchmark import BACKENDS, make_position
+    from ai import AI
+
+    parser = argparse.ArgumentParser(description="Stats and profile of one AI move on the benchmark position")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=BOARD_BACKEND)
+    parser.add_argument('--size', type=int, default=BOARD_SIZE)
+    parser.add_argument('--depth', type=int, default=AI_DEPTH)
+    parser.add_argument('--time-limit', type=float, default=None)
+    parser.add_argument('--profile', choices=('cprofile', 'sample'), default=None)
+    parser.add_argument('--out', default=None, help="profile output file")
+    parser.add_argument('--log', default=None, help="append the stats to this JSONL file")
+    args = parser.parse_args()
+
+    board, p1, p2 = make_position(BACKENDS[args.backend], args.size)
+    ai = AI(2, seed=0, workers=1, depth=args.depth)
+    ai.book = None
+    ai.instrument = True
+    ai.stats_log = args.log
+    if args.profile:
+        with profile_move(args.profile, args.out) as prof:
+            ai.get_best_move(board, p1, p2, time_limit=args.time_limit, node_limit=None)
+        print(prof.report())
+    else:
+        ai.get_best_move(board, p1, p2, time_limit=args.time_limit, node_limit=None)
+    print(json.dumps(ai.last_stats.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Load generator for server.py: plays many games at once as the human side.
+
+    python loadgen.py --games 50 --concurrency 20 --size 9 --time-limit 0.2
+
+Each concurrent client opens its own connection and plays games back to
+back: its pawn heads for the goal row (with some random steps and walls so
+games differ). Moves refused as "busy" are retried after a short back-off.
+Prints client-side latency percentiles and the server's metrics.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from settings import *
+from server import percentile
+
+# Chance the simulated human places a wall / steps at random instead of forward
+LOADGEN_WALL_RATE = 0.15
+LOADGEN_RANDOM_RATE = 0.2
+LOADGEN_MAX_PLIES = 200
+LOADGEN_BACKOFF = 0.05  # Seconds before a "busy" move is retried (doubles, capped at 1s)
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._ids = 0
+
+    async def request(self, op, **fields):
+        self._ids += 1
+        self.writer.write((json.dumps({'op': op, 'id': self._ids, **fields}) + '\n').encode())
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.writer.close()
+
+
+async def connect(host, port, unix):
+    if unix:
+        reader, writer = await asyncio.open_unix_connection(unix)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    return Client(reader, writer)
+
+
+def choose_move(state, rng):
+    """A plausible human move for the state returned by the server."""
+    me = state['players'][state['human'] - 1]
+    if me['walls'] > 0 and rng.random() < LOADGEN_WALL_RATE:
+        c, r = rng.randrange(state['size'] - 1), rng.randrange(state['size'] - 1)
+        return 'wall', {'at': [c, r], 'orient': rng.choice('HV')}
+    moves = state['moves']
+    if rng.random() < LOADGEN_RANDOM_RATE:
+        return 'move', {'to': rng.choice(moves)}
+    return 'move', {'to': min(moves, key=lambda m: abs(m[1] - me['goal_row']))}
+
+
+async def play(client, stats, rng, size, time_limit, engine):
+    start = time.perf_counter()
+    response = await client.request('create', size=size, time_limit=time_limit, engine=engine)
+    if not response['ok']:
+        raise RuntimeError(f"create failed: {response['error']}")
+    stats['latency'].append(time.perf_counter() - start)
+    state = response
+    game = state['game']
+
+    while state['winner'] is None and state['plies'] < LOADGEN_MAX_PLIES:
+        op, fields = choose_move(state, rng)
+        backoff = LOADGEN_BACKOFF
+        while True:
+            start = time.perf_counter()
+            response = await client.request(op, game=game, **fields)
+            if response['ok'] or response['error'] != 'busy':
+                break
+            stats['busy'] += 1
+            await asyncio.sleep(backoff)
+            backoff = min(1.0, backoff * 2)
+        if not response['ok']:
+            if response['error'] != 'illegal move':
+                raise RuntimeError(f"game {game}: {response['error']}")
+            stats['illegal'] += 1  # Random walls are often illegal; just pick again
+            continue
+        stats['latency'].append(time.perf_counter() - start)
+        stats['moves'] += 1
+        state = response
+
+    await client.request('close', game=game)
+    stats['games'] += 1
+    stats['wins' if state['winner'] == state['human'] else 'losses'] += 1
+
+
+async def worker(host, port, unix, games, stats, seed, size, time_limit, engine):
+    client = await connect(host, port, unix)
+    rng = random.Random(seed)
+    try:
+        while games:
+            games.pop()
+            await play(client, stats, rng, size, time_limit, engine)
+    finally:
+        client.close()
+
+
+async def run(host, port, unix, games, concurrency, size, time_limit, engine, seed=0):
+    stats = {'games': 0, 'moves': 0, 'busy': 0, 'illegal': 0, 'wins': 0, 'losses': 0, 'latency': []}
+    queue = list(range(games))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, unix, queue, stats, seed + i, size, time_limit, engine)
+                           for i in range(min(concurrency, games))))
+    elapsed = time.perf_counter() - start
+
+    latency = sorted(stats.pop('latency'))
+    print(f"{stats['games']} games, {stats['moves']} moves in {elapsed:.1f}s "
+          f"({stats['moves'] / elapsed:.1f} moves/s); human wins {stats['wins']}, losses {stats['losses']}")
+    print(f"busy retries {stats['busy']}, illegal moves {stats['illegal']}")
+    print("client latency: " + ", ".join(f"p{q} {percentile(latency, q):.3f}s" for q in (50, 90, 99)))
+
+    client = await connect(host, port, unix)
+    try:
+        print("server metrics:", json.dumps(await client.request('metrics')))
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for server.py")
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--unix', default=None, help="Unix socket path instead of TCP")
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=10, help="games played at the same time")
+    parser.add_argument('--size', type=int, default=BOARD_SIZE)
+    parser.add_argument('--time-limit', type=float, default=0.2, help="AI seconds per move")
+    parser.add_argument('--engine', choices=('alphabeta', 'mcts'), default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.unix, args.games, args.concurrency, args.size,
+                    args.time_limit, args.engine, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 import pygame
 import sys
+import threading
+import traceback
+import concurrent.futures
 from settings import *
-from board import Board
-from player import Player
+from board import new_board
+from player import start_players
 from ui import UI
-from ai import AI
+from ai import new_ai
+from paranoid import ParanoidAI
+from record import PASS, append_game
+from paths import data_path
 
 def main():
     pygame.init()
@@ -16,18 +22,83 @@ def main():
     state = 'MENU' # State: 'MENU', 'GAME', 'GAMEOVER'
     game_mode = None # 'PvP' or 'PvAI'
     current_board_size = 9 # Default game size
+    player_count = 2 # 2 or 4 players
+    ai_engine = None # 'alphabeta' / 'mcts' picked in the menu; None = settings.py default for the size
 
     # Game Objects
     board = None
-    p1 = None
-    p2 = None
-    ai_agent = None
-    turn = 1
+    players = [] # P1 (always human), P2, and P3/P4 in 4-player games
+    ai_agents = {} # Seat number -> AI playing it (PvAI: every seat but P1)
+    turn = 1 # Seat number of the player to move
+    moves = [] # Plies of the current game, appended to the game record when it ends
+
+    # The AI searches on a background thread so the window keeps redrawing.
+    # ai_stop cancels the running search (quit / back to menu / new game).
+    # During the human's turn the same thread ponders (see AI.ponder)
+    ai_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    ai_future = None
+    ai_stop = None
+    ponder_future = None
+    ponder_stop = None
+
+    def stop_pondering():
+        nonlocal ponder_future
+        if ponder_future is not None:
+            ponder_stop.set()
+            ponder_future.result()
+            ponder_future = None
+
+    def cancel_ai_search():
+        nonlocal ai_future
+        stop_pondering()
+        if ai_future is not None:
+            ai_stop.set()
+            ai_future.result()  # Aborts at the next node
+            ai_future = None
+
+    def save_record(winner=None):
+        nonlocal moves
+        if GAME_RECORD_PATH and moves:
+            append_game(data_path(GAME_RECORD_PATH), board.size, moves, winner, len(players))
+        moves = []
+
+    def turn_walls():
+        """Walls the player to move may place: one batched legality pass per turn, then O(1) lookups."""
+        nonlocal legal_walls
+        if legal_walls is None:
+            active = players[turn - 1]
+            legal_walls = frozenset(board.legal_walls(*players)) if active.has_walls() else frozenset()
+        return legal_walls
+
+    def engine_for(size):
+        return ai_engine or AI_ENGINE_BY_SIZE.get(size, AI_ENGINE)
+
+    def start_game(mode):
+        nonlocal game_mode, state, board, players, ai_agents, turn, valid_moves, moves, legal_walls
+        cancel_ai_search()
+        moves = []
+        legal_walls = None
+        for agent in ai_agents.values(): agent.close()
+        game_mode = mode
+        state = 'GAME'
+        turn = 1
+        board = new_board(current_board_size)
+        # Pawns start centered on their sides, based on size
+        players = start_players(current_board_size, player_count)
+        ai_agents = {}
+        if mode == 'PvAI':
+            for p in players[1:]:
+                seat = p.id
+                p.id = "AI"
+                ai_agents[seat] = new_ai(seat, current_board_size, ai_engine) if player_count == 2 else ParanoidAI(seat - 1)
+        valid_moves = board.get_valid_moves(players[0], *players[1:])
 
     # Input State
     input_mode = 'MOVE'
     wall_orientation = 'H'
     valid_moves = []
+    legal_walls = None # Legal placements of the human to move, computed on first use each turn
+    show_legal_walls = SHOW_LEGAL_WALLS
     winner = None
 
     running = True
@@ -35,126 +106,175 @@ def main():
         # Event Handling
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                cancel_ai_search()
+                save_record() # Unfinished games are kept too (no winner)
                 running = False
 
             if state == 'MENU':
                 if event.type == pygame.MOUSEBUTTONDOWN:
-                    btn1, btn2, btn3 = ui.draw_menu(current_board_size)
+                    btn1, btn2, btn3, btn4, btn5 = ui.draw_menu(current_board_size, player_count, engine_for(current_board_size))
                     mx, my = pygame.mouse.get_pos()
 
                     # 1. Start PvP
                     if btn1.collidepoint((mx, my)):
-                        game_mode = 'PvP'
-                        state = 'GAME'
-                        board = Board(size=current_board_size)
-                        # Center pawns based on size
-                        mid = current_board_size // 2
-                        p1 = Player((mid, current_board_size - 1), PLAYER_1_COLOR, 0, 1)
-                        p2 = Player((mid, 0), PLAYER_2_COLOR, current_board_size - 1, 2)
-                        valid_moves = board.get_valid_moves(p1, p2)
+                        start_game('PvP')
 
                     # 2. Start PvAI
                     elif btn2.collidepoint((mx, my)):
-                        game_mode = 'PvAI'
-                        state = 'GAME'
-                        board = Board(size=current_board_size)
-                        mid = current_board_size // 2
-                        p1 = Player((mid, current_board_size - 1), PLAYER_1_COLOR, 0, 1)
-                        p2 = Player((mid, 0), PLAYER_2_COLOR, current_board_size - 1, "AI")
-                        ai_agent = AI(2)
-                        valid_moves = board.get_valid_moves(p1, p2)
+                        start_game('PvAI')
 
                     # 3. Toggle Size
                     elif btn3.collidepoint((mx, my)):
-                        # Cycle 5 -> 7 -> 9 -> 11 -> 5
-                        if current_board_size == 9: current_board_size = 11
-                        elif current_board_size == 11: current_board_size = 5
-                        elif current_board_size == 5: current_board_size = 7
-                        else: current_board_size = 9
+                        # Cycle 5 -> 7 -> 9 -> ... -> 21 -> 5
+                        i = BOARD_SIZES.index(current_board_size)
+                        current_board_size = BOARD_SIZES[(i + 1) % len(BOARD_SIZES)]
+
+                    # 4. Toggle 2 / 4 players
+                    elif btn4.collidepoint((mx, my)):
+                        player_count = 6 - player_count
+
+                    # 5. Toggle the 2-player AI engine: alpha-beta <-> MCTS
+                    elif btn5.collidepoint((mx, my)):
+                        ai_engine = 'mcts' if engine_for(current_board_size) == 'alphabeta' else 'alphabeta'
 
             elif state == 'GAME':
-                current_player = p1 if turn == 1 else p2
-                opponent = p2 if turn == 1 else p1
+                current_player = players[turn - 1]
+                others = [p for p in players if p is not current_player]
+
+                # ESC: back to the menu (stops the AI if it is thinking)
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    cancel_ai_search()
+                    save_record()
+                    state = 'MENU'
+                    turn = 1
+                    continue
 
                 # Input Handling for Human
-                if not (game_mode == 'PvAI' and turn == 2):
+                if turn not in ai_agents:
                     if event.type == pygame.KEYDOWN:
                         if event.key == pygame.K_SPACE:
                             wall_orientation = 'V' if wall_orientation == 'H' else 'H'
                         if event.key == pygame.K_TAB:
                             input_mode = 'WALL' if input_mode == 'MOVE' else 'MOVE'
                             if input_mode == 'MOVE':
-                                valid_moves = board.get_valid_moves(current_player, opponent)
+                                valid_moves = board.get_valid_moves(current_player, *others)
                             else:
                                 valid_moves = []
+                        if event.key == pygame.K_l:
+                            show_legal_walls = not show_legal_walls
 
                     if event.type == pygame.MOUSEBUTTONDOWN:
                         mx, my = pygame.mouse.get_pos()
 
-                        # Dynamic conversion from mouse to grid requires dynamic offset
-                        ox, oy = ui._get_offsets(current_board_size)
-                        gx = (mx - ox) // (CELL_SIZE + MARGIN)
-                        gy = (my - oy) // (CELL_SIZE + MARGIN)
+                        # Dynamic conversion from mouse to grid (offset and cell size depend on the board size)
+                        gx, gy = ui.cell_at(current_board_size, (mx, my))
 
                         if input_mode == 'MOVE':
                             if (gx, gy) in valid_moves:
                                 current_player.move((gx, gy))
-                                if current_player.pos[1] == current_player.goal_row:
+                                moves.append(('move', (gx, gy)))
+                                if current_player.reached_goal():
                                     winner = turn
                                     state = 'GAMEOVER'
+                                    save_record(winner)
                                 else:
-                                    turn = 3 - turn # Switch 1 <-> 2
-                                    valid_moves = board.get_valid_moves(opponent, current_player) # Prep for next
+                                    turn = turn % len(players) + 1 # Next seat: 1 -> 2 (-> 3 -> 4) -> 1
+                                    legal_walls = None
+                                    following = players[turn - 1]
+                                    valid_moves = board.get_valid_moves(following, *[p for p in players if p is not following]) # Prep for next
 
                         elif input_mode == 'WALL':
-                            if current_player.has_walls():
-                                if board.place_wall(gx, gy, wall_orientation, p1, p2):
+                            # Illegal spots are turned down by the per-turn cache, without touching the board
+                            if (gx, gy, wall_orientation) in turn_walls():
+                                if board.place_wall(gx, gy, wall_orientation, *players):
                                     current_player.use_wall()
-                                    turn = 3 - turn
+                                    moves.append(('wall', (gx, gy), wall_orientation))
+                                    turn = turn % len(players) + 1
+                                    legal_walls = None
                                     valid_moves = [] # Reset
 
         # Logic Update
+        # A human with no pawn move and no legal wall (4-player: boxed in by
+        # pawns) has nothing to click: the seat passes, as a stuck AI does
+        if state == 'GAME' and turn not in ai_agents:
+            stuck = players[turn - 1]
+            if not board.get_valid_moves(stuck, *[p for p in players if p is not stuck]) and not turn_walls():
+                moves.append(PASS)
+                turn = turn % len(players) + 1
+                legal_walls = None
+                following = players[turn - 1]
+                valid_moves = board.get_valid_moves(following, *[p for p in players if p is not following])
+
+        # Pondering only runs while the human is to move
+        if ponder_future is not None and not (state == 'GAME' and turn == 1):
+            stop_pondering()
+
         if state == 'GAME':
-            current_player = p1 if turn == 1 else p2
+            current_player = players[turn - 1]
+            others = [p for p in players if p is not current_player]
 
-            # AI TURN
-            if game_mode == 'PvAI' and turn == 2:
-                # Force draw before AI thinks
-                ui.draw_game_screen(board, p1, p2, turn, input_mode, wall_orientation)
-                pygame.display.flip()
+            # AI TURN: start the search in the background, apply it once done
+            if turn in ai_agents and ai_future is None:
+                ai_stop = threading.Event()
+                agent = ai_agents[turn]
+                # AI takes (board, p1, p2), the 4-player search (board, players)
+                args = (board, *players) if len(players) == 2 else (board, players)
+                ai_future = ai_executor.submit(agent.get_best_move, *args, stop_event=ai_stop)
 
-                # AI Logic
-                move = ai_agent.get_best_move(board, p1, p2)
-                ai_agent.apply_move(board, p2, p1, move)
+            elif turn in ai_agents and ai_future.done():
+                try:
+                    move = ai_future.result()
+                except Exception:
+                    traceback.print_exc()  # A failed search passes instead of taking the window down
+                    move = None
+                ai_future = None
+                # None: no legal move (a 4-player pawn boxed in by pawns, no walls), the seat passes
+                if move is not None:
+                    board.apply(move, current_player, *others)
+                moves.append(move if move is not None else PASS)
 
-                if p2.pos[1] == p2.goal_row:
-                    winner = 2
+                if current_player.reached_goal():
+                    winner = turn
                     state = 'GAMEOVER'
+                    save_record(winner)
                 else:
-                    turn = 1
-                    valid_moves = board.get_valid_moves(p1, p2) # Prep for human
+                    turn = turn % len(players) + 1
+                    legal_walls = None
+                    if turn == 1:
+                        valid_moves = board.get_valid_moves(players[0], *players[1:]) # Prep for human
+
+            # HUMAN TURN: let the AI pre-search its answers meanwhile (2-player
+            # games). It gets copies, as the human's move changes the live
+            # objects at any time
+            elif AI_PONDER and len(ai_agents) == 1 and turn == 1 and ponder_future is None:
+                ai_agent = ai_agents[2]
+                ponder_stop = threading.Event()
+                ponder_future = ai_executor.submit(ai_agent.ponder, board.clone(), ai_agent.clone_player(players[0]),
+                                                   ai_agent.clone_player(players[1]), ponder_stop)
 
         # Drawing
         if state == 'MENU':
-            ui.draw_menu(current_board_size)
+            ui.draw_menu(current_board_size, player_count, engine_for(current_board_size))
         elif state == 'GAME':
-            ui.draw_game_screen(board, p1, p2, turn, input_mode, wall_orientation)
+            ui.draw_game_screen(board, players, turn, input_mode, wall_orientation)
+            if ai_future is not None:
+                ui.draw_thinking(board, ai_agents[turn].nodes, ai_agents[turn].depth_reached)
 
-            if turn == 1 or game_mode == 'PvP': # Only highlight valid moves for humans
+            if turn not in ai_agents: # Only highlight valid moves for humans
                 if input_mode == 'MOVE':
                     ui.highlight_moves(board, valid_moves)
                 elif input_mode == 'WALL':
-                    mx, my = pygame.mouse.get_pos()
-                    ox, oy = ui._get_offsets(current_board_size)
-                    gx = (mx - ox) // (CELL_SIZE + MARGIN)
-                    gy = (my - oy) // (CELL_SIZE + MARGIN)
-                    ui.draw_ghost_wall(board, gx, gy, wall_orientation)
+                    gx, gy = ui.cell_at(current_board_size, pygame.mouse.get_pos())
+                    if show_legal_walls:
+                        ui.draw_legal_walls(board, turn_walls(), wall_orientation)
+                    ui.draw_ghost_wall(board, gx, gy, wall_orientation, (gx, gy, wall_orientation) in turn_walls())
 
         elif state == 'GAMEOVER':
+            ui.invalidate()
             screen.fill(BACKGROUND)
 
             win_text = f"PLAYER {winner} WINS!"
-            if game_mode == 'PvAI' and winner == 2:
+            if winner in ai_agents:
                 win_text = "COMPUTER WINS!"
 
             txt = ui.title_font.render(win_text, True, WHITE)
@@ -168,9 +288,15 @@ def main():
                 state = 'MENU'
                 turn = 1
 
-        pygame.display.flip()
+        if state == 'GAME':
+            ui.present() # Pushes only the changed rectangles
+        else:
+            pygame.display.flip()
         clock.tick(60)
 
+    cancel_ai_search() # The last frame may have started pondering again
+    ai_executor.shutdown(wait=True)
+    for agent in ai_agents.values(): agent.close()
     pygame.quit()
     sys.exit()
 
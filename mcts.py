@@ -0,0 +1,272 @@
+"""
+Monte Carlo Tree Search (UCT) engine, an alternative to the alpha-beta AI.
+
+Every simulation walks down the tree picking the child with the best UCT
+score, adds one new child, plays a short guided rollout from there and backs
+the result up the path. The move played is the most visited root child.
+
+  - Progressive widening: a node with n visits has at most
+    1 + MCTS_WIDENING * sqrt(n) children, taken best-first from the alpha-beta
+    move ordering, so the tree goes deep on big boards instead of trying
+    every wall once.
+  - Rollouts are not random: pawns step along a shortest path and, with
+    probability MCTS_ROLLOUT_WALLS, a wall cutting the opponent's path is
+    placed. After MCTS_ROLLOUT_PLIES plies the position is scored with the
+    evaluation (evaluation.py) squashed to a win probability.
+  - The tree is kept between turns: the next search (and pondering on the
+    opponent's time) continues from the subtree of the position reached.
+  - With workers > 1 each process grows its own tree (root parallelism) and
+    the root visit counts are added up.
+
+MCTSAI is a drop-in for AI: same get_best_move(board, p1, p2, ...), and the
+opening book and endgame solver still answer first. Pick it with AI_ENGINE or
+AI_ENGINE_BY_SIZE in settings.py (see ai.new_ai).
+"""
+import concurrent.futures
+import math
+import multiprocessing
+import time
+from settings import *
+from ai import AI
+from board import shortest_path, walls_near_path
+from player import Player
+
+# Seconds between two looks at the caller's stop_event while workers grow their trees
+STOP_POLL = 0.01
+
+# Per-process state of a root-parallel worker
+_worker_engine = None
+_shared_stop = None
+
+
+def _init_worker(shared_stop):
+    global _shared_stop
+    _shared_stop = shared_stop
+
+
+class Node:
+    """A position in the tree, reached by `move`. value sums the rewards of the player who made it."""
+    __slots__ = ('move', 'key', 'by_ai', 'won', 'children', 'untried', 'visits', 'value')
+
+    def __init__(self, move, key, by_ai, won=False):
+        self.move = move
+        self.key = key
+        self.by_ai = by_ai  # The AI made `move` (so the opponent is to move here)
+        self.won = won  # `move` put its player's pawn on the goal
+        self.children = []
+        self.untried = None  # Moves not expanded yet, best last; generated on the first visit
+        self.visits = 0
+        self.value = 0.0
+
+
+def _search_tree(ai_id, weights, seed, board_cls, board_state, player_states, simulations, time_left):
+    """
+    Worker entry point: grows this process's tree from the position (AI to
+    move) within the budget. Returns ([(move, visits, value)] of the root, simulations).
+    """
+    global _worker_engine
+    if _worker_engine is None or _worker_engine.id != ai_id or _worker_engine.evaluator.weights != weights:
+        _worker_engine = MCTSAI(ai_id, workers=1, weights=weights)
+    engine = _worker_engine
+    engine.rng.seed(seed)
+
+    board = board_cls.from_state(board_state)
+    ai_player, opp_player = [Player.from_state(s) for s in player_states]
+    board.reset_key((ai_player, opp_player), ai_player)
+    engine.begin_search(time_left, simulations, _shared_stop)
+    root = engine._root(board, by_ai=False)
+    engine._grow(root, board, ai_player, opp_player, simulations)
+    engine.tree = root
+    return [(c.move, c.visits, c.value) for c in root.children], engine.nodes
+
+
+class MCTSAI(AI):
+    """
+    UCT search with the AI interface. Without a time or node limit it runs
+    `simulations` simulations; nodes counts simulations, depth_reached is the
+    deepest tree level visited.
+    """
+    def __init__(self, player_id, seed=None, workers=MCTS_WORKERS, depth=AI_DEPTH, weights=None,
+                 simulations=MCTS_SIMULATIONS):
+        super().__init__(player_id, seed=seed, workers=1, depth=depth, weights=weights)
+        self.simulations = simulations
+        self.mcts_workers = workers
+        self.tree = None  # Kept between turns
+        self.tree_reused = 0
+        self._pool = None
+        self._shared_stop = None
+
+    def _search(self, board, ai_player, opp_player, max_depth):
+        root = self._root(board, by_ai=False)
+        moves = self.get_all_moves(board, ai_player, opp_player)
+        if len(moves) <= 1:
+            self.tree = None
+            return moves[0] if moves else None
+
+        if self.node_limit is not None:
+            budget = self.node_limit
+        else:
+            budget = None if self.deadline is not None else self.simulations
+
+        if self.mcts_workers > 1:
+            visits = self._parallel_grow(root, board, ai_player, opp_player, budget)
+        else:
+            self._grow(root, board, ai_player, opp_player, budget)
+            visits = {c.move: c.visits for c in root.children}
+        self._lap('search')
+
+        best = max(visits, key=visits.get) if visits else moves[0]
+        # The next search starts below the move played, if it is in the tree
+        self.tree = next((c for c in root.children if c.move == best), None)
+        return best
+
+    def ponder(self, board, p1, p2, stop_event):
+        """Grows the tree of the current position (opponent to move) until stop_event is set."""
+        board = board.clone()
+        ai_player = self.clone_player(p2 if self.id == 2 else p1)
+        opp_player = self.clone_player(p1 if self.id == 2 else p2)
+        board.reset_key((ai_player, opp_player), opp_player)
+        self.begin_search(None, None, stop_event)
+        root = self._root(board, by_ai=True)
+        self._grow(root, board, ai_player, opp_player, None)
+        self.tree = root
+
+    def _root(self, board, by_ai):
+        """The kept subtree of this position (up to two plies below the last root), or a new node."""
+        node = self.tree
+        if node is not None:
+            for candidate in [node] + node.children + [g for c in node.children for g in c.children]:
+                if candidate.key == board.key and candidate.by_ai == by_ai:
+                    self.tree_reused += 1
+                    return candidate
+        return Node(None, board.key, by_ai)
+
+    def _out_of_budget(self, budget):
+        if budget is not None and self.nodes >= budget:
+            return True
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            return True
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def _grow(self, root, board, ai_player, opp_player, budget):
+        while not self._out_of_budget(budget):
+            self.nodes += 1
+            self._simulate(root, board, ai_player, opp_player)
+
+    def _simulate(self, root, board, ai_player, opp_player):
+        """One selection / expansion / rollout / backup pass. Leaves the board as it found it."""
+        node = root
+        path = [root]
+        applied = 0
+        while not node.won:
+            mover, other = (opp_player, ai_player) if node.by_ai else (ai_player, opp_player)
+            if node.untried is None:
+                node.untried = self._candidates(board, mover, other)
+            if node.untried and len(node.children) < 1 + MCTS_WIDENING * math.sqrt(node.visits):
+                move = node.untried.pop()
+                board.apply(move, mover, other)
+                applied += 1
+                node.children.append(Node(move, board.key, mover is ai_player, mover.reached_goal()))
+                path.append(node.children[-1])
+                node = node.children[-1]
+                break
+            if not node.children:
+                break  # No legal move at all
+            node = self._select(node)
+            board.apply(node.move, mover, other)
+            applied += 1
+            path.append(node)
+        self.depth_reached = max(self.depth_reached, len(path) - 1)
+
+        if node.won:
+            reward = 1.0 if node.by_ai else 0.0
+        else:
+            reward = self._rollout(board, ai_player, opp_player, not node.by_ai)
+        for _ in range(applied):
+            board.undo()
+
+        for n in path:
+            n.visits += 1
+            n.value += reward if n.by_ai else 1.0 - reward
+
+    def _select(self, node):
+        log_n = math.log(node.visits)
+        return max(node.children,
+                   key=lambda c: c.value / c.visits + MCTS_EXPLORATION * math.sqrt(log_n / c.visits))
+
+    def _candidates(self, board, mover, other):
+        """mover's moves ordered worst-first, so list.pop() expands the most promising next."""
+        moves = self.get_all_moves(board, mover, other)
+        self._order_moves(board, moves, mover, other, 0, None)
+        moves.reverse()
+        return moves
+
+    def _rollout(self, board, ai_player, opp_player, ai_to_move):
+        """Guided playout from the current position; returns the AI's win probability."""
+        mover, other = (ai_player, opp_player) if ai_to_move else (opp_player, ai_player)
+        plies = 0
+        while plies < MCTS_ROLLOUT_PLIES:
+            move = self._rollout_move(board, mover, other)
+            if move is None:
+                break
+            board.apply(move, mover, other)
+            plies += 1
+            if mover.reached_goal():
+                break
+            mover, other = other, mover
+        score = self.evaluator.evaluate(board, ai_player, opp_player, mover is ai_player)
+        for _ in range(plies):
+            board.undo()
+        return 1.0 / (1.0 + math.exp(-score / MCTS_EVAL_SCALE))
+
+    def _rollout_move(self, board, mover, other):
+        if mover.walls_remaining > 0 and self.rng.random() < MCTS_ROLLOUT_WALLS:
+            walls = walls_near_path(board.size, shortest_path(board, other.pos, other.goal), 0)
+            for _ in range(min(3, len(walls))):
+                c, r, orient = self.rng.choice(walls)
+                if board.is_legal_wall(c, r, orient, mover, other):
+                    return ('wall', (c, r), orient)
+        steps = board.get_valid_moves(mover, other)
+        if not steps:
+            return None
+        return ('move', min(steps, key=lambda pos: board.get_shortest_path_len(pos, mover.goal)))
+
+    def _parallel_grow(self, root, board, ai_player, opp_player, budget):
+        """
+        Root parallelism: workers - 1 processes grow their own trees while
+        this one grows `root`. Returns {root move: visits over all trees}.
+        stop_event is relayed to the workers through a multiprocessing.Event.
+        """
+        if self._pool is None:
+            self._shared_stop = multiprocessing.Event()
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.mcts_workers - 1, initializer=_init_worker, initargs=(self._shared_stop,))
+        self._shared_stop.clear()
+        share = None if budget is None else max(1, budget // self.mcts_workers)
+        time_left = None if self.deadline is None else max(0.0, self.deadline - time.perf_counter())
+        board_state = board.to_state()
+        player_states = (ai_player.to_state(), opp_player.to_state())
+        futures = [self._pool.submit(_search_tree, self.id, self.evaluator.weights, self.rng.random(),
+                                     type(board), board_state, player_states, share, time_left)
+                   for _ in range(self.mcts_workers - 1)]
+
+        self._grow(root, board, ai_player, opp_player, share)
+        visits = {c.move: c.visits for c in root.children}
+        pending = set(futures)
+        while pending:
+            if self.stop_event is not None and self.stop_event.is_set():
+                self._shared_stop.set()  # Workers stop at their next simulation
+            done, pending = concurrent.futures.wait(pending, timeout=STOP_POLL)
+            for future in done:
+                children, nodes = future.result()
+                self.nodes += nodes
+                for move, n, _ in children:
+                    visits[move] = visits.get(move, 0) + n
+        return visits
+
+    def close(self):
+        super().close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self._shared_stop = None
@@ -0,0 +1,128 @@
+import concurrent.futures
+import multiprocessing
+import time
+from settings import *
+from player import Player
+from transposition import EXACT
+
+# Workers search against (shared alpha - ALPHA_MARGIN) rather than the shared
+# alpha itself. A move that only ties the best score found so far then still
+# comes back with its exact score instead of a fail-low bound, so the
+# "first move with the best score wins" rule picks the same move as the
+# serial search.
+ALPHA_MARGIN = 1e-6
+
+# Seconds between two looks at the caller's stop_event while workers search
+STOP_POLL = 0.01
+
+# Per-process state of a worker
+_shared_alpha = None
+_shared_stop = None
+_worker_ai = None
+
+
+def _init_worker(shared_alpha, shared_stop):
+    global _shared_alpha, _shared_stop
+    _shared_alpha = shared_alpha
+    _shared_stop = shared_stop
+
+
+def _search_moves(ai_id, weights, board_cls, board_state, player_states, moves, depth, time_left, node_limit):
+    """
+    Worker entry point: rebuilds the position and searches its share of the
+    root moves. Returns ([(index, score), ...], nodes, aborted).
+    The worker keeps one AI between calls so its TT and history carry over.
+    """
+    global _worker_ai
+    from ai import AI, SearchAborted
+
+    if _worker_ai is None or _worker_ai.id != ai_id or _worker_ai.evaluator.weights != weights:
+        _worker_ai = AI(ai_id, workers=1, weights=weights)
+    ai = _worker_ai
+
+    board = board_cls.from_state(board_state)
+    ai_player, opp_player = [Player.from_state(s) for s in player_states]
+    board.reset_key((ai_player, opp_player), ai_player)
+    ai.begin_search(time_left, node_limit, _shared_stop)
+    ai._root_depth = depth
+
+    results = []
+    try:
+        for index, move in moves:
+            alpha = _shared_alpha.value - ALPHA_MARGIN
+            board.apply(move, ai_player, opp_player)
+            score = ai.minimax(board, depth - 1, alpha, float('inf'), False, ai_player, opp_player)
+            board.undo()
+            results.append((index, score))
+
+            with _shared_alpha.get_lock():
+                if score > _shared_alpha.value:
+                    _shared_alpha.value = score
+    except SearchAborted:
+        return results, ai.nodes, True
+    return results, ai.nodes, False
+
+
+class ParallelRootSearch:
+    """
+    Root splitting over a process pool. The first (best-ordered) root move is
+    searched in the calling process to get a good alpha; the remaining moves
+    are dealt round-robin to the workers, which share the alpha bound through
+    a multiprocessing.Value. The caller's stop_event is relayed to them
+    through a multiprocessing.Event, which their _check_limits polls.
+    """
+    def __init__(self, workers=AI_WORKERS):
+        self.workers = workers
+        self.shared_alpha = multiprocessing.Value('d', -float('inf'))
+        self.shared_stop = multiprocessing.Event()
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(self.shared_alpha, self.shared_stop))
+
+    def search(self, ai, board, moves, depth, ai_player, opp_player):
+        """Same result contract as AI._search_root; raises SearchAborted if out of budget."""
+        from ai import SearchAborted
+
+        ai._root_depth = depth
+        board.apply(moves[0], ai_player, opp_player)
+        first_score = ai.minimax(board, depth - 1, -float('inf'), float('inf'), False, ai_player, opp_player)
+        board.undo()
+        scores = {0: first_score}
+        self.shared_alpha.value = first_score
+        self.shared_stop.clear()
+
+        rest = list(enumerate(moves))[1:]
+        if rest:
+            time_left = None
+            if ai.deadline is not None:
+                time_left = max(0.0, ai.deadline - time.perf_counter())
+            node_limit = None
+            if ai.node_limit is not None:
+                node_limit = max(1, (ai.node_limit - ai.nodes) // self.workers)
+
+            board_state = board.to_state()
+            player_states = (ai_player.to_state(), opp_player.to_state())
+            futures = [self.pool.submit(_search_moves, ai.id, ai.evaluator.weights, type(board), board_state,
+                                        player_states, rest[w::self.workers], depth, time_left, node_limit)
+                       for w in range(self.workers) if rest[w::self.workers]]
+
+            aborted = False
+            pending = set(futures)
+            while pending:
+                done, pending = concurrent.futures.wait(pending, timeout=STOP_POLL)
+                if ai.stop_event is not None and ai.stop_event.is_set():
+                    self.shared_stop.set()  # Workers abort at their next node
+                for future in done:
+                    results, nodes, worker_aborted = future.result()
+                    ai.nodes += nodes
+                    aborted = aborted or worker_aborted
+                    scores.update(results)
+            if aborted:
+                raise SearchAborted()
+
+        # Highest score wins, ties go to the earlier move (as in the serial loop)
+        best_index = max(scores, key=lambda i: (scores[i], -i))
+        ai.tt.store(board.key, depth, scores[best_index], EXACT, moves[best_index])
+        return moves[best_index], scores[best_index]
+
+    def close(self):
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,160 @@
+"""
+AI for 4-player games.
+
+A max-n search would keep one score per player and can hardly prune. The
+paranoid search assumes instead that every opponent plays against the AI:
+the AI maximizes its score, each opponent in turn minimizes it. That is a
+two-sided tree again, so alpha-beta, the transposition table, killers,
+history and iterative deepening of ai.AI all carry over, and leaves are
+scored with the same evaluation (the AI against the opponent closest to its
+goal) from the board's cached distance maps.
+"""
+from settings import *
+from ai import AI, SearchAborted
+from evaluation import WIN_SCORE
+from transposition import EXACT, LOWER, UPPER
+from zobrist import get_keys, pawn_slot
+
+
+class ParanoidAI(AI):
+    """
+    Plays seat `seat` (index into the players list) of a game with any
+    number of players. The opening book, endgame solver, pondering and
+    root-parallel search of AI are 2-player only and stay off.
+    """
+    def __init__(self, seat, seed=None, depth=AI_MULTI_DEPTH, weights=None):
+        super().__init__(seat, seed=seed, workers=1, depth=depth, weights=weights)
+        self.book = None
+        self.endgame = None
+        self._turn_keys = []
+        self._others = []
+
+    def get_best_move(self, board, players, time_limit=AI_TIME_LIMIT, node_limit=AI_NODE_LIMIT, stop_event=None):
+        """Same contract as AI.get_best_move, for the player at self.id in players."""
+        board = board.clone()
+        players = [self.clone_player(p) for p in players]
+        board.reset_key(players, players[self.id])
+        self.begin_search(time_limit, node_limit, stop_event)
+        # The incremental key only flips a side bit per ply; with more than
+        # two players the player to move is XORed in on every probe
+        keys = get_keys(board.size)
+        self._turn_keys = [keys.turn[pawn_slot(p)] for p in players]
+        self._others = [[q for q in players if q is not p] for p in players]
+
+        moves = self._moves(board, players, self.id)
+        if len(moves) <= 1:
+            return moves[0] if moves else None
+        self.rng.shuffle(moves)
+        self._order_moves(board, moves, players[self.id], self._leader(board, players), 0,
+                          self._probe_move(board, self.id))
+
+        limited = time_limit is not None or node_limit is not None
+        best_move = moves[0]
+        for depth in range(1, (AI_MAX_DEPTH if limited else self.depth) + 1):
+            try:
+                move, score = self._search_root_n(board, players, moves, depth)
+            except SearchAborted:
+                break
+            best_move = move
+            self.depth_reached = depth
+            self._move_to_front(moves, move)
+            if abs(score) >= WIN_SCORE: break
+        return best_move
+
+    def _search_root_n(self, board, players, moves, depth):
+        best_score = -float('inf')
+        best_move = None
+        alpha = -float('inf')
+        self._root_depth = depth
+        me = players[self.id]
+        for move in moves:
+            board.apply(move, me, *self._others[self.id])
+            score = self.paranoid(board, players, depth - 1, alpha, float('inf'), self._next(players, self.id))
+            board.undo()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+        self.tt.store(board.key ^ self._turn_keys[self.id], depth, best_score, EXACT, best_move)
+        return best_move, best_score
+
+    def paranoid(self, board, players, depth, alpha, beta, turn):
+        """Alpha-beta value of the position with players[turn] to move (AI maximizes, the rest minimize)."""
+        self._check_limits()
+
+        # The player who just moved may have reached its goal
+        last = (turn - 1) % len(players)
+        if players[last].reached_goal():
+            return WIN_SCORE if last == self.id else -WIN_SCORE
+        if depth == 0:
+            return self.evaluator.evaluate(board, players[self.id], self._leader(board, players), turn == self.id)
+
+        key = board.key ^ self._turn_keys[turn]
+        alpha_orig, beta_orig = alpha, beta
+        tt_move = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            _, tt_depth, tt_score, tt_flag, tt_move, _ = entry
+            if tt_depth >= depth:
+                if tt_flag == EXACT: return tt_score
+                if tt_flag == LOWER and tt_score >= beta: return tt_score
+                if tt_flag == UPPER and tt_score <= alpha: return tt_score
+
+        ply = self._root_depth - depth
+        mover = players[turn]
+        maximizing = turn == self.id
+        target = self._leader(board, players) if maximizing else players[self.id]
+        rest = [p for p in self._others[turn] if p is not target]
+        moves = self.staged_moves(board, mover, target, ply, tt_move, *rest)
+
+        best = -float('inf') if maximizing else float('inf')
+        best_move = None
+        following = self._next(players, turn)
+        for i, move in enumerate(moves):
+            board.apply(move, mover, *self._others[turn])
+            score = self.paranoid(board, players, depth - 1, alpha, beta, following)
+            board.undo()
+
+            if maximizing:
+                if score > best:
+                    best, best_move = score, move
+                alpha = max(alpha, score)
+            else:
+                if score < best:
+                    best, best_move = score, move
+                beta = min(beta, score)
+            if beta <= alpha:
+                self._record_cutoff(move, i, ply, depth)
+                break
+        moves.close()  # Counts the walls a cutoff left unchecked
+
+        if best_move is None:  # Boxed in by pawns: no move at all
+            return self.evaluator.evaluate(board, players[self.id], self._leader(board, players), maximizing)
+        if best <= alpha_orig: flag = UPPER
+        elif best >= beta_orig: flag = LOWER
+        else: flag = EXACT
+        self.tt.store(key, depth, best, flag, best_move)
+        return best
+
+    def _next(self, players, turn):
+        return (turn + 1) % len(players)
+
+    def _moves(self, board, players, turn):
+        """
+        Moves of players[turn]. Walls are looked for around the mover and the
+        player it fights: the leading opponent for the AI, the AI for everyone
+        else (the paranoid assumption).
+        """
+        mover = players[turn]
+        target = self._leader(board, players) if turn == self.id else players[self.id]
+        rest = [p for p in self._others[turn] if p is not target]
+        return self.get_all_moves(board, mover, target, *rest)
+
+    def _leader(self, board, players):
+        """The AI's opponent closest to its goal."""
+        return min((p for i, p in enumerate(players) if i != self.id),
+                   key=lambda p: board.get_shortest_path_len(p.pos, p.goal))
+
+    def _probe_move(self, board, turn):
+        entry = self.tt.probe(board.key ^ self._turn_keys[turn])
+        return entry[4] if entry is not None else None
@@ -0,0 +1,9 @@
+import os
+
+
+def data_path(path):
+    """
+    Relative paths of data files (opening book, tablebase, evaluation
+    weights, game records) are taken relative to the game's directory, not the cwd.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
@@ -1,19 +1,63 @@
 from settings import *
 
 class Player:
-    def __init__(self, start_pos, color, goal_row, player_id):
+    def __init__(self, start_pos, color, goal_row, player_id, goal_col=None):
         self.pos = start_pos  # Tuple (col, row)
         self.color = color
         self.walls_remaining = 10
+        # A player races to a row (top/bottom) or, in 4-player games, to a column
         self.goal_row = goal_row
+        self.goal_col = goal_col
+        # Goal as the board takes it (see board.goal_cells)
+        self.goal = goal_row if goal_col is None else ('col', goal_col)
         self.id = player_id
 
+    def to_state(self):
+        """Picklable snapshot, e.g. for search worker processes."""
+        return (self.pos, self.color, self.goal_row, self.id, self.walls_remaining, self.goal_col)
+
+    @classmethod
+    def from_state(cls, state):
+        pos, color, goal_row, player_id, walls_remaining, goal_col = state
+        player = cls(pos, color, goal_row, player_id, goal_col)
+        player.walls_remaining = walls_remaining
+        return player
+
     def move(self, new_pos):
         self.pos = new_pos
 
+    def reached_goal(self):
+        if self.goal_col is not None:
+            return self.pos[0] == self.goal_col
+        return self.pos[1] == self.goal_row
+
     def has_walls(self):
         return self.walls_remaining > 0
 
     def use_wall(self):
         if self.walls_remaining > 0:
             self.walls_remaining -= 1
+
+    # --- Undo helpers (used by Board.undo during AI search) ---
+    def undo_move(self, prev_pos):
+        self.pos = prev_pos
+
+    def return_wall(self):
+        self.walls_remaining += 1
+
+
+def start_players(size, count=2):
+    """
+    Players at their start positions: P1 bottom and P2 top race across the
+    rows; in a 4-player game P3 (left) and P4 (right) race across the columns.
+    Walls are shared out so the total stays that of a 2-player game.
+    """
+    mid = size // 2
+    players = [Player((mid, size - 1), PLAYER_1_COLOR, 0, 1),
+               Player((mid, 0), PLAYER_2_COLOR, size - 1, 2)]
+    if count == 4:
+        players += [Player((0, mid), PLAYER_3_COLOR, None, 3, goal_col=size - 1),
+                    Player((size - 1, mid), PLAYER_4_COLOR, None, 4, goal_col=0)]
+    for p in players:
+        p.walls_remaining = 2 * p.walls_remaining // count
+    return players
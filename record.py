@@ -0,0 +1,240 @@
+"""
+Game records: a compact, append-only binary file of finished games.
+
+    python record.py stats games.qgr
+    python record.py check games.qgr
+    python record.py replay games.qgr --game 12
+
+File layout: b'QGR1', then one entry per game, back to back:
+    header  uint8 size, uint8 players, uint8 walls per player,
+            uint8 winner seat (0 = unfinished), uint16 plies, uint16 move bytes
+    moves   one board.encode_move code per ply, in one byte if it is below
+            0x80 (pawn moves up to 11x11), else in two bytes big-endian with
+            the top bit set (walls, and pawn moves on bigger boards). A pass
+            (a 4-player pawn with no move at all) is coded 3 * size * size,
+            just past the wall codes
+A 9x9 game of 60 plies takes about 100 bytes. Games are only ever appended;
+the reader maps the file and walks it entry by entry, so iterating millions
+of games keeps one game in memory at a time. A truncated last entry (a
+crash mid-write) is ignored.
+"""
+import argparse
+import collections
+import mmap
+import os
+import struct
+from settings import *
+from board import new_board, encode_move, decode_move
+from player import start_players
+
+RECORD_MAGIC = b'QGR1'
+_GAME = struct.Struct('<BBBBHH')
+
+# The ply of a player with no legal move
+PASS = ('pass',)
+
+# offset: where the entry starts in the file
+GameRecord = collections.namedtuple('GameRecord', 'size players walls winner moves offset')
+
+
+class RecordError(ValueError):
+    """A record that is not a legal game."""
+
+
+def pack_moves(size, moves):
+    out = bytearray()
+    for move in moves:
+        code = 3 * size * size if move == PASS else encode_move(size, move)
+        if code < 0x80:
+            out.append(code)
+        else:
+            out += bytes((0x80 | code >> 8, code & 0xFF))
+    return bytes(out)
+
+
+def unpack_moves(size, data):
+    moves = []
+    i = 0
+    while i < len(data):
+        code = data[i]
+        if code & 0x80:
+            code = (code & 0x7F) << 8 | data[i + 1]
+            i += 1
+        moves.append(PASS if code == 3 * size * size else decode_move(size, code))
+        i += 1
+    return moves
+
+
+class RecordWriter:
+    """Appends games to a record file; each game is written and flushed as one entry."""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(RECORD_MAGIC)
+
+    def write(self, size, moves, winner=None, players=2, walls=None):
+        """moves: AI move tuples in the order played. walls: per player at the start."""
+        if walls is None:
+            walls = start_players(size, players)[0].walls_remaining
+        data = pack_moves(size, moves)
+        self.file.write(_GAME.pack(size, players, walls, winner or 0, len(moves), len(data)) + data)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def append_game(path, size, moves, winner=None, players=2, walls=None):
+    """Opens, appends one game and closes: for callers that record a game now and then."""
+    with RecordWriter(path) as writer:
+        writer.write(size, moves, winner, players, walls)
+
+
+class RecordReader:
+    """Memory-mapped, read-only view of a record file. Iterating yields GameRecords."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b''
+        if self.data[:len(RECORD_MAGIC)] != RECORD_MAGIC:
+            raise ValueError(f"{path} is not a {RECORD_MAGIC.decode()} file")
+
+    def headers(self, offset=len(RECORD_MAGIC)):
+        """(offset, size, players, walls, winner, plies) per game, without decoding moves."""
+        end = len(self.data)
+        while offset + _GAME.size <= end:
+            size, players, walls, winner, plies, nbytes = _GAME.unpack_from(self.data, offset)
+            if offset + _GAME.size + nbytes > end:
+                return  # Truncated last entry
+            yield offset, size, players, walls, winner, plies
+            offset += _GAME.size + nbytes
+
+    def __iter__(self):
+        for offset, size, players, walls, winner, plies in self.headers():
+            yield self.read(offset)
+
+    def read(self, offset):
+        """The game whose entry starts at offset (as given by headers())."""
+        size, players, walls, winner, plies, nbytes = _GAME.unpack_from(self.data, offset)
+        start = offset + _GAME.size
+        return GameRecord(size, players, walls, winner or None,
+                          unpack_moves(size, self.data[start:start + nbytes]), offset)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+def replay(game):
+    """
+    Plays a GameRecord from the start, checking every ply: pawn moves must be
+    in get_valid_moves, walls must pass place_wall with a wall in hand, a pass
+    needs a pawn with no move, and nobody may move after the game is won. Yields (ply, move, board, players)
+    after each ply (the same board/players objects, updated in place). Raises
+    RecordError at the first illegal ply or if the recorded winner is wrong.
+    """
+    board = new_board(game.size)
+    players = start_players(game.size, game.players)
+    for p in players:
+        p.walls_remaining = game.walls
+    winner = None
+    for ply, move in enumerate(game.moves):
+        if winner is not None:
+            raise RecordError(f"ply {ply}: game already won by player {winner}")
+        active = players[ply % len(players)]
+        others = [p for p in players if p is not active]
+        if move[0] == 'move':
+            if move[1] not in board.get_valid_moves(active, *others):
+                raise RecordError(f"ply {ply}: player {active.id} cannot move to {move[1]}")
+            active.move(move[1])
+        elif move == PASS:
+            if board.get_valid_moves(active, *others):
+                raise RecordError(f"ply {ply}: player {active.id} passes with pawn moves left")
+        else:
+            (c, r), orient = move[1], move[2]
+            if not active.has_walls():
+                raise RecordError(f"ply {ply}: player {active.id} has no walls left")
+            if not board.place_wall(c, r, orient, *players):
+                raise RecordError(f"ply {ply}: illegal wall {(c, r)} {orient}")
+            active.use_wall()
+        if active.reached_goal():
+            winner = active.id
+        yield ply, move, board, players
+    if winner != game.winner:
+        raise RecordError(f"recorded winner {game.winner}, replay gives {winner}")
+
+
+def _stats(reader):
+    games = plies = walls_used = 0
+    wins = collections.Counter()
+    sizes = collections.Counter()
+    for game in reader:
+        games += 1
+        plies += len(game.moves)
+        walls_used += sum(1 for m in game.moves if m[0] == 'wall')
+        wins[game.winner] += 1
+        sizes[game.size] += 1
+    print(f"{games} games, {os.path.getsize(reader.path)} bytes")
+    if games:
+        print(f"sizes: {dict(sorted(sizes.items()))}")
+        print(f"winners: {dict(sorted(wins.items(), key=lambda kv: kv[0] or 0))}")
+        print(f"plies/game {plies / games:.1f}, walls/game {walls_used / games:.1f}")
+
+
+def _check(reader):
+    good = bad = 0
+    for game in reader:
+        try:
+            for _ in replay(game):
+                pass
+            good += 1
+        except RecordError as e:
+            bad += 1
+            print(f"game at offset {game.offset}: {e}")
+    print(f"{good} games ok, {bad} invalid")
+    return bad
+
+
+def _show(reader, index):
+    for i, header in enumerate(reader.headers()):
+        if i == index:
+            game = reader.read(header[0])
+            break
+    else:
+        raise SystemExit(f"no game {index}")
+    print(f"{game.size}x{game.size}, {game.players} players, {game.walls} walls each, winner {game.winner}")
+    for ply, move, board, players in replay(game):
+        pawns = ' '.join(f"P{p.id}{p.pos}" for p in players)
+        where = f"{move[1]} {move[2]}" if move[0] == 'wall' else ('' if move == PASS else f"{move[1]}")
+        print(f"{ply + 1:>4} P{players[ply % len(players)].id} {move[0]:<4} {where:<12} {pawns}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Game record files")
+    parser.add_argument('command', choices=('stats', 'check', 'replay'))
+    parser.add_argument('path')
+    parser.add_argument('--game', type=int, default=0, help="game index for replay")
+    args = parser.parse_args()
+
+    reader = RecordReader(args.path)
+    try:
+        if args.command == 'stats':
+            _stats(reader)
+        elif args.command == 'check':
+            if _check(reader):
+                raise SystemExit(1)
+        else:
+            _show(reader, args.game)
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
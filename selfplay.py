@@ -0,0 +1,184 @@
+"""
+Headless AI-vs-AI games, no pygame needed.
+
+    python selfplay.py --games 1000 --size 9 --depth 3 --workers 8 --out results.jsonl
+
+Each side can play with its own evaluation weights (--weights-p1/-p2, JSON
+files as in evaluation.py), which is how a set of tuned weights is tested,
+and with its own engine (--engine-p1/-p2: alphabeta or mcts).
+
+Games are spread over a process pool and every finished game is appended to
+the output file right away (JSON lines, or CSV if the file ends in .csv), so a
+long overnight run can be inspected - or resumed with a new --seed - at any time.
+"""
+import argparse
+import concurrent.futures
+import csv
+import json
+import os
+import random
+import time
+from settings import *
+from board import new_board
+from player import Player
+from ai import new_ai
+from evaluation import load_weights
+from record import RecordWriter
+
+# A game with no winner after this many plies is recorded as a draw
+SELFPLAY_MAX_PLIES = 200
+# Opening plies played at random (from the seed) so games with different
+# seeds actually diverge; the fixed-depth search alone is nearly deterministic
+SELFPLAY_RANDOM_PLIES = 2
+
+CSV_FIELDS = ['game', 'seed', 'size', 'depth', 'winner', 'plies', 'walls_used_p1', 'walls_used_p2',
+              'think_p1', 'think_p2', 'max_think', 'duration']
+
+
+def play_game(game, seed, size=BOARD_SIZE, depth=AI_DEPTH, time_limit=None, node_limit=None,
+              max_plies=SELFPLAY_MAX_PLIES, random_plies=SELFPLAY_RANDOM_PLIES, weights=(None, None),
+              engines=(None, None)):
+    """
+    Plays one AI-vs-AI game and returns its result as a dict. Without a time
+    limit both sides search to a fixed depth, so a game is fully determined
+    by its seed. weights: evaluation weights of (P1, P2), None = weights file.
+    engines: engine of (P1, P2), None = the one settings.py picks for the size.
+    """
+    rng = random.Random(seed)
+    board = new_board(size)
+    mid = size // 2
+    p1 = Player((mid, size - 1), PLAYER_1_COLOR, 0, 1)
+    p2 = Player((mid, 0), PLAYER_2_COLOR, size - 1, 2)
+    agents = {1: new_ai(1, size, engines[0], seed=seed, workers=1, depth=depth, weights=weights[0]),
+              2: new_ai(2, size, engines[1], seed=seed + 1, workers=1, depth=depth, weights=weights[1])}
+
+    start_walls = p1.walls_remaining
+    start = time.perf_counter()
+    think_times = []
+    played = []
+    winner = None
+    turn = 1
+    while len(think_times) < max_plies:
+        active, waiting = (p1, p2) if turn == 1 else (p2, p1)
+
+        t = time.perf_counter()
+        if len(think_times) < random_plies:
+            moves = agents[turn].get_all_moves(board, active, waiting)
+            move = rng.choice(moves) if moves else None
+        else:
+            move = agents[turn].get_best_move(board, p1, p2, time_limit=time_limit, node_limit=node_limit)
+        think_times.append(round(time.perf_counter() - t, 4))
+        if move is None:
+            break
+        board.apply(move, active, waiting)
+        played.append(move)
+
+        if active.pos[1] == active.goal_row:
+            winner = turn
+            break
+        turn = 3 - turn
+
+    return {
+        'game': game,
+        'seed': seed,
+        'size': size,
+        'depth': depth,
+        'winner': winner,
+        'plies': len(think_times),
+        'walls_used': [start_walls - p1.walls_remaining, start_walls - p2.walls_remaining],
+        'think_times': think_times,
+        'duration': round(time.perf_counter() - start, 3),
+        'moves': played,  # Taken out again by run(): only the game record keeps them
+    }
+
+
+def _csv_row(result):
+    times = result['think_times']
+    return {
+        'game': result['game'],
+        'seed': result['seed'],
+        'size': result['size'],
+        'depth': result['depth'],
+        'winner': result['winner'] or 0,
+        'plies': result['plies'],
+        'walls_used_p1': result['walls_used'][0],
+        'walls_used_p2': result['walls_used'][1],
+        # Total think time per side (p1 moves on even plies)
+        'think_p1': round(sum(times[0::2]), 4),
+        'think_p2': round(sum(times[1::2]), 4),
+        'max_think': max(times) if times else 0,
+        'duration': result['duration'],
+    }
+
+
+def run(games, out_path, size=BOARD_SIZE, depth=AI_DEPTH, seed=0, workers=None,
+        time_limit=None, node_limit=None, max_plies=SELFPLAY_MAX_PLIES, random_plies=SELFPLAY_RANDOM_PLIES,
+        weights=(None, None), engines=(None, None), record_path=None):
+    """
+    Plays `games` games (seeds seed, seed+2, seed+4, ...) on `workers`
+    processes and appends each result to out_path as it finishes, and each
+    game's moves to record_path (record.py) if given.
+    Returns {1: wins, 2: wins, None: draws}.
+    """
+    workers = workers or os.cpu_count() or 1
+    as_csv = out_path.endswith('.csv')
+    tally = {1: 0, 2: 0, None: 0}
+
+    new_file = not os.path.exists(out_path) or os.path.getsize(out_path) == 0
+    with open(out_path, 'a', newline='') as f, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS) if as_csv else None
+        if writer and new_file:
+            writer.writeheader()
+        recorder = RecordWriter(record_path) if record_path else None
+
+        # Each game uses two seeds (one per side)
+        futures = [pool.submit(play_game, g, seed + 2 * g, size, depth, time_limit, node_limit,
+                               max_plies, random_plies, weights, engines)
+                   for g in range(games)]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            moves = result.pop('moves')
+            if recorder:
+                recorder.write(result['size'], moves, result['winner'])
+            if writer:
+                writer.writerow(_csv_row(result))
+            else:
+                f.write(json.dumps(result) + '\n')
+            f.flush()
+            tally[result['winner']] += 1
+        if recorder:
+            recorder.close()
+    return tally
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless AI-vs-AI self-play")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--size', type=int, default=BOARD_SIZE)
+    parser.add_argument('--depth', type=int, default=AI_DEPTH, help="fixed search depth (ignored with --time-limit)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument('--time-limit', type=float, default=None, help="seconds per move instead of a fixed depth")
+    parser.add_argument('--node-limit', type=int, default=None)
+    parser.add_argument('--max-plies', type=int, default=SELFPLAY_MAX_PLIES)
+    parser.add_argument('--random-plies', type=int, default=SELFPLAY_RANDOM_PLIES, help="random opening plies")
+    parser.add_argument('--out', default='selfplay.jsonl', help="output file, .jsonl or .csv")
+    parser.add_argument('--weights-p1', default=None, help="evaluation weights file of player 1")
+    parser.add_argument('--weights-p2', default=None, help="evaluation weights file of player 2")
+    parser.add_argument('--engine-p1', choices=('alphabeta', 'mcts'), default=None, help="default: from settings.py")
+    parser.add_argument('--engine-p2', choices=('alphabeta', 'mcts'), default=None)
+    parser.add_argument('--record', default=None, help="also append every game's moves to this record file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tally = run(args.games, args.out, args.size, args.depth, args.seed, args.workers,
+                args.time_limit, args.node_limit, args.max_plies, args.random_plies,
+                [load_weights(os.path.abspath(p)) if p else None for p in (args.weights_p1, args.weights_p2)],
+                (args.engine_p1, args.engine_p2), args.record)
+    print(f"{args.games} games in {time.perf_counter() - start:.1f}s - "
+          f"P1 {tally[1]}, P2 {tally[2]}, draws {tally[None]} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+Game server: many human-vs-AI games at once, over TCP or a Unix socket.
+
+    python server.py --port 8765 --workers 4
+    python server.py --unix /tmp/quoridor.sock
+
+Protocol: one JSON object per line each way. Every request has an "op" and
+may carry an "id", which is echoed in the response. Responses have "ok" and
+either the result or an "error".
+
+    {"op": "create", "size": 9, "engine": "mcts", "time_limit": 1.0}   (all optional)
+    {"op": "move", "game": 3, "to": [4, 7]}
+    {"op": "wall", "game": 3, "at": [4, 6], "orient": "H"}
+    {"op": "state", "game": 3}
+    {"op": "close", "game": 3}
+    {"op": "metrics"}
+
+create, move and wall answer with the game state once the AI has replied
+(its move is in "ai_move"). The state lists the pawn moves of the player to
+move, so a client needs no game logic of its own. Games belong to the
+connection that created them and end with it (or with close); then they
+are appended to the game record file, GAME_RECORD_PATH (record.py).
+
+AI searches run in a process pool of `workers` processes. A move, or a
+create where the AI opens, is refused with error "busy" (nothing played,
+try again) while SERVER_QUEUE_LIMIT searches are already waiting or
+running. Each game's AI has SERVER_GAME_BUDGET seconds of thinking for the
+whole game, and at most time_limit per move.
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import json
+import time
+from settings import *
+from board import new_board
+from player import Player, start_players
+from record import append_game
+from paths import data_path
+
+# Per-process AIs of a search worker: {(engine, seat): AI}. One AI serves
+# every game of that engine; its transposition table is keyed by position
+_worker_ais = {}
+
+# Latencies kept for the percentiles in metrics
+LATENCY_WINDOW = 1000
+
+
+def _search(engine, seat, size, board_cls, board_state, player_states, time_limit):
+    """Worker entry point: (AI move, seconds spent searching)."""
+    from ai import new_ai
+    ai = _worker_ais.get((engine, seat))
+    if ai is None:
+        ai = _worker_ais[(engine, seat)] = new_ai(seat, size, engine, workers=1)
+    board = board_cls.from_state(board_state)
+    p1, p2 = [Player.from_state(s) for s in player_states]
+    start = time.perf_counter()
+    move = ai.get_best_move(board, p1, p2, time_limit=time_limit, node_limit=None)
+    return move, time.perf_counter() - start
+
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0..100) of a sorted list; 0.0 if empty."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))]
+
+
+class RequestError(Exception):
+    """A request that cannot be served; the message goes back to the client."""
+
+
+class Game:
+    def __init__(self, game_id, size, engine, time_limit, human_seat=1):
+        self.id = game_id
+        self.size = size
+        self.engine = engine
+        self.time_limit = time_limit
+        self.budget = SERVER_GAME_BUDGET  # AI thinking seconds left
+        self.board = new_board(size)
+        self.players = start_players(size)
+        self.human = human_seat
+        self.turn = 1
+        self.winner = None
+        self.plies = 0
+        self.ai_move = None
+        self.moves = []  # For the game record
+        self.lock = asyncio.Lock()  # One request at a time per game
+
+    def play(self, move):
+        """Plays move for the player to move; False if it is not legal."""
+        active, waiting = self.players[self.turn - 1], self.players[2 - self.turn]
+        if move[0] == 'move':
+            if move[1] not in self.board.get_valid_moves(active, waiting):
+                return False
+        elif active.walls_remaining == 0:
+            return False
+        if not self.board.apply(move, active, waiting):
+            return False
+        self.moves.append(move)
+        self.plies += 1
+        if active.reached_goal():
+            self.winner = self.turn
+        else:
+            self.turn = 3 - self.turn
+        return True
+
+    def state(self):
+        active, waiting = self.players[self.turn - 1], self.players[2 - self.turn]
+        return {
+            'game': self.id,
+            'size': self.size,
+            'turn': self.turn,
+            'human': self.human,
+            'winner': self.winner,
+            'plies': self.plies,
+            'players': [{'seat': p.id, 'pos': p.pos, 'goal_row': p.goal_row, 'walls': p.walls_remaining}
+                        for p in self.players],
+            'walls': [[c, r, o] for (c, r), o in self.board.walls],
+            'moves': [] if self.winner else self.board.get_valid_moves(active, waiting),
+            'ai_move': self.ai_move,
+        }
+
+
+class GameServer:
+    def __init__(self, workers=SERVER_WORKERS, queue_limit=SERVER_QUEUE_LIMIT, max_games=SERVER_MAX_GAMES):
+        self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.max_games = max_games
+        self.games = {}
+        self._ids = itertools.count(1)
+        # Metrics
+        self.pending = 0  # Searches submitted and not finished (queued + running)
+        self.searches = 0
+        self.busy_rejections = 0
+        self.requests = 0
+        self.latency = collections.deque(maxlen=LATENCY_WINDOW)  # Submit -> AI move, seconds
+        self.think = collections.deque(maxlen=LATENCY_WINDOW)  # Search time alone
+        self.started = time.perf_counter()
+
+    async def handle(self, reader, writer):
+        """One client connection: requests are answered in order."""
+        owned = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.dispatch(line, owned)
+                writer.write((json.dumps(response) + '\n').encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game_id in owned:
+                self.end_game(game_id)
+            writer.close()
+
+    async def dispatch(self, line, owned):
+        self.requests += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            request_id = request.get('id')
+            op = request.get('op')
+            if op == 'create':
+                result = await self.create(request, owned)
+            elif op in ('move', 'wall', 'state', 'close'):
+                game = self._game(request, owned)
+                async with game.lock:
+                    result = await getattr(self, 'op_' + op)(game, request, owned)
+            elif op == 'metrics':
+                result = self.metrics()
+            else:
+                raise RequestError(f"unknown op {op!r}")
+            response = {'ok': True, **result}
+        except RequestError as e:
+            response = {'ok': False, 'error': str(e)}
+        except (ValueError, TypeError, KeyError) as e:
+            response = {'ok': False, 'error': f"bad request: {e}"}
+        if request_id is not None:
+            response['id'] = request_id
+        return response
+
+    def _game(self, request, owned):
+        game_id = request.get('game')
+        if game_id not in owned:
+            raise RequestError(f"no game {game_id!r} on this connection")
+        return self.games[game_id]
+
+    async def create(self, request, owned):
+        if len(self.games) >= self.max_games:
+            raise RequestError("too many games")
+        size = int(request.get('size', BOARD_SIZE))
+        if size not in BOARD_SIZES:
+            raise RequestError(f"size must be one of {list(BOARD_SIZES)}")
+        engine = request.get('engine') or AI_ENGINE_BY_SIZE.get(size, AI_ENGINE)
+        if engine not in ('alphabeta', 'mcts'):
+            raise RequestError(f"unknown engine {engine!r}")
+        time_limit = min(float(request.get('time_limit', SERVER_MOVE_TIME)), SERVER_MOVE_TIME)
+        human = int(request.get('seat', 1))
+        if human not in (1, 2):
+            raise RequestError("seat must be 1 or 2")
+
+        if human != 1:
+            self._check_busy()  # The AI opens: refuse before the game exists, so a retry is safe
+        game = Game(next(self._ids), size, engine, time_limit, human)
+        self.games[game.id] = game
+        owned.add(game.id)
+        async with game.lock:
+            if game.turn != game.human:
+                await self.ai_turn(game)
+        return game.state()
+
+    async def op_move(self, game, request, owned):
+        return await self.human_turn(game, ('move', tuple(request['to'])))
+
+    async def op_wall(self, game, request, owned):
+        c, r = request['at']
+        orient = request['orient']
+        if orient not in ('H', 'V'):
+            raise RequestError("orient must be 'H' or 'V'")
+        return await self.human_turn(game, ('wall', (int(c), int(r)), orient))
+
+    async def op_state(self, game, request, owned):
+        return game.state()
+
+    async def op_close(self, game, request, owned):
+        owned.discard(game.id)
+        self.end_game(game.id)
+        return {'game': game.id, 'closed': True}
+
+    async def human_turn(self, game, move):
+        if game.winner is not None:
+            raise RequestError("game is over")
+        if game.turn != game.human:
+            raise RequestError("not your turn")
+        # Backpressure: refuse before anything is played, so a retry is safe
+        self._check_busy()
+        if not game.play(move):
+            raise RequestError("illegal move")
+        if game.winner is None:
+            await self.ai_turn(game)
+        return game.state()
+
+    def _check_busy(self):
+        """Backpressure for every request that starts a search: "busy" once queue_limit are pending."""
+        if self.pending >= self.queue_limit:
+            self.busy_rejections += 1
+            raise RequestError("busy")
+
+    async def ai_turn(self, game):
+        """Runs the AI's search in the pool and plays its move."""
+        time_limit = max(SERVER_MIN_MOVE_TIME, min(game.time_limit, game.budget))
+        p1, p2 = game.players
+        ai_seat = 3 - game.human
+        self.pending += 1
+        submitted = time.perf_counter()
+        try:
+            move, think = await asyncio.get_running_loop().run_in_executor(
+                self.pool, _search, game.engine, ai_seat, game.size, type(game.board),
+                game.board.to_state(), (p1.to_state(), p2.to_state()), time_limit)
+        finally:
+            self.pending -= 1
+        self.searches += 1
+        self.latency.append(time.perf_counter() - submitted)
+        self.think.append(think)
+        game.budget = max(0.0, game.budget - think)
+        if move is None or not game.play(move):
+            raise RequestError("AI found no legal move")
+        game.ai_move = move
+
+    def end_game(self, game_id):
+        """Forgets a game, appending it to the game record (GAME_RECORD_PATH) if any ply was played."""
+        game = self.games.pop(game_id, None)
+        if game is not None and game.moves and GAME_RECORD_PATH:
+            append_game(data_path(GAME_RECORD_PATH), game.size, game.moves, game.winner)
+
+    def metrics(self):
+        latency = sorted(self.latency)
+        think = sorted(self.think)
+        return {
+            'uptime': round(time.perf_counter() - self.started, 1),
+            'games': len(self.games),
+            'requests': self.requests,
+            'searches': self.searches,
+            'workers': self.workers,
+            'queue_depth': max(0, self.pending - self.workers),
+            'pending': self.pending,
+            'busy_rejections': self.busy_rejections,
+            'move_latency': {f'p{q}': round(percentile(latency, q), 4) for q in (50, 90, 99)},
+            'think_time': {f'p{q}': round(percentile(think, q), 4) for q in (50, 90, 99)},
+        }
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+async def serve(host=SERVER_HOST, port=SERVER_PORT, unix=None, workers=SERVER_WORKERS):
+    server = GameServer(workers)
+    if unix:
+        listener = await asyncio.start_unix_server(server.handle, path=unix)
+    else:
+        listener = await asyncio.start_server(server.handle, host, port)
+    where = unix or f"{host}:{port}"
+    print(f"Quoridor server on {where}, {workers} search workers")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quoridor game server (JSON lines over TCP / Unix socket)")
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--unix', default=None, help="Unix socket path instead of TCP")
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS, help="AI search processes")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,17 @@
 SCREEN_WIDTH = 1000 # Made wider for sidebar/instructions
 SCREEN_HEIGHT = 700
 CAPTION = "Quoridor - Graph Implementation"
+TEXT_CACHE_SIZE = 256  # Rendered text surfaces kept by the UI
 
 # Board Settings
 BOARD_SIZE = 9
+BOARD_SIZES = (5, 7, 9, 11, 13, 15, 17, 19, 21)  # Menu cycle; the UI scales cells down from 13x13 up
+SHOW_LEGAL_WALLS = False  # Start with the legal-wall overlay on (toggle with L in wall mode)
 CELL_SIZE = 50
 MARGIN = 10
 BOARD_OFFSET_X = 50
 BOARD_OFFSET_Y = 100
+BOARD_BACKEND = 'bitboard'  # 'bitboard' (packed ints, O(1) clone) or 'graph' (adjacency dict)
 
 # Colors (R, G, B)
 WHITE = (255, 255, 255)
@@ -17,8 +21,12 @@ BACKGROUND = (40, 40, 40)
 GRID_COLOR = (200, 200, 200)
 WALL_COLOR = (219, 172, 52)
 HOVER_COLOR = (255, 255, 255, 100)
+ILLEGAL_WALL_COLOR = (220, 60, 60)  # Ghost wall where the wall cannot go
+LEGAL_WALL_COLOR = (219, 172, 52, 90)  # "Show legal walls" overlay (translucent)
 PLAYER_1_COLOR = (200, 50, 50)  # Red (Human)
 PLAYER_2_COLOR = (50, 50, 200)  # Blue (AI/Human)
+PLAYER_3_COLOR = (50, 170, 50)  # Green (4-player games)
+PLAYER_4_COLOR = (200, 120, 30)  # Orange (4-player games)
 VALID_MOVE_COLOR = (50, 200, 50)
 TEXT_COLOR = (220, 220, 220)
 BUTTON_COLOR = (70, 70, 70)
@@ -29,5 +37,46 @@ WALL_THICKNESS = MARGIN
 WALL_LENGTH = (CELL_SIZE * 2) + MARGIN
 
 # AI Settings
-AI_DEPTH = 2  # Depth 3 is smarter but slower in Python. Depth 2 is fast.
+AI_ENGINE = 'alphabeta'  # 'alphabeta' (ai.py) or 'mcts' (mcts.py): the 2-player engine
+AI_ENGINE_BY_SIZE = {}  # Board size -> engine, overrides AI_ENGINE (e.g. {17: 'mcts', 21: 'mcts'})
+AI_DEPTH = 4  # Plies searched when there is no time/node limit. See benchmark.py for timings per size/depth
+AI_TIME_LIMIT = 1.5  # Seconds per AI move (iterative deepening). None = fixed AI_DEPTH search
+AI_NODE_LIMIT = None  # Optional cap on nodes per AI move
+AI_MULTI_DEPTH = 3  # Plies (one per player) of the 4-player search (paranoid.py) without a time limit
+AI_WALL_RADIUS = 0  # Walls the AI considers: 0 = cutting either player's shortest path, n = within n-1 cells of it
+AI_MAX_DEPTH = 12  # Deepest iteration tried when searching against a budget
+AI_WORKERS = 1  # Processes for root-parallel search (1 = serial, single process)
+AI_INSTRUMENT = False  # Per-move search stats in AI.last_stats (instrument.py)
+AI_STATS_LOG = None  # JSON lines file every AI move's stats are appended to (implies AI_INSTRUMENT)
+AI_PONDER = True  # Search likely replies on the human's time (PvAI)
 INF = 999999
+AI_USE_BOOK = True  # Answer from the opening book (book.py) when the position is in it
+BOOK_PATH = 'opening_book.bin'  # Built with: python book.py
+BOOK_PLIES = 6  # Plies from the start position the book covers
+BOOK_DEPTH = 5  # Search depth of each book move
+BOOK_WIDTH = 3  # Moves followed per book position (best + likely alternatives)
+AI_USE_ENDGAME = True  # Play pawn races (no walls left) exactly, see endgame.py
+ENDGAME_MAX_STATES = 60000  # Boards whose race can have more states (15x15 and up) are left to the search
+ENDGAME_TIME_SHARE = 0.5  # Part of the move's time limit the race solver may use before giving up
+TABLEBASE_PATH = 'endgame.bin'  # Optional precomputed races, built with: python endgame.py
+GAME_RECORD_PATH = 'games.qgr'  # Games played in main.py / server.py are appended here (record.py); None = off
+EVAL_WEIGHTS_PATH = 'eval_weights.json'  # Evaluation weights (see evaluation.py); defaults if missing
+WALLEVAL_MIN_SIZE = 9  # Root walls are scored in one NumPy batch from this board size up
+MCTS_SIMULATIONS = 3000  # Simulations per MCTS move without a time/node limit
+MCTS_WORKERS = 1  # Processes growing MCTS trees in parallel (root parallelism)
+MCTS_EXPLORATION = 0.7  # UCT exploration constant
+MCTS_WIDENING = 2.0  # A node with n visits has at most 1 + MCTS_WIDENING * sqrt(n) children
+MCTS_ROLLOUT_PLIES = 8  # Guided plies per rollout before the position is scored
+MCTS_ROLLOUT_WALLS = 0.2  # Chance a rollout ply places a wall on the opponent's path
+MCTS_EVAL_SCALE = 2.0  # Evaluation points per logistic unit when turning a score into a win chance
+TT_SIZE = 1 << 18  # Transposition table slots (rounded up to a power of two), ~25 MB when full
+
+# Server Settings (server.py)
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+SERVER_WORKERS = 2  # AI search processes shared by all games
+SERVER_QUEUE_LIMIT = 8  # Searches queued + running before moves are refused as "busy"
+SERVER_MAX_GAMES = 1000
+SERVER_MOVE_TIME = 1.0  # Longest AI think time per move (a game may ask for less)
+SERVER_GAME_BUDGET = 60.0  # AI think time per game; once spent, moves get SERVER_MIN_MOVE_TIME
+SERVER_MIN_MOVE_TIME = 0.05
@@ -0,0 +1,88 @@
+import sys
+from settings import *
+
+# Bound types
+EXACT = 0
+LOWER = 1  # Search failed high: real score >= stored score
+UPPER = 2  # Search failed low: real score <= stored score
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of searched positions, indexed by the low bits of
+    the Zobrist key. Each slot holds one tuple:
+        (key, depth, score, flag, best_move, generation)
+    Replacement policy: a slot is overwritten unless it holds a different
+    position from the current search that was searched deeper.
+    Entries from earlier searches (older generation) are always replaceable.
+    """
+    def __init__(self, size=TT_SIZE):
+        # Round up to a power of two so the index is a single mask
+        self.size = 1 << max(0, (size - 1).bit_length())
+        self.mask = self.size - 1
+        self.entries = [None] * self.size
+        self.filled = 0
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.rejected = 0
+
+    def new_search(self):
+        """Call once per root search: ages old entries and restarts the counters."""
+        self.generation += 1
+        self.reset_stats()
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.filled = 0
+
+    def probe(self, key):
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, score, flag, best_move):
+        i = key & self.mask
+        old = self.entries[i]
+        if old is None:
+            self.filled += 1
+        elif old[0] != key:
+            if old[5] == self.generation and old[1] > depth:
+                self.rejected += 1
+                return
+            self.overwrites += 1
+        self.stores += 1
+        self.entries[i] = (key, depth, score, flag, best_move, self.generation)
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def occupancy(self):
+        return self.filled / self.size
+
+    def memory_bytes(self):
+        """Rough footprint: the slot list plus one entry tuple per filled slot."""
+        per_entry = sys.getsizeof((0, 0, 0.0, 0, None, 0))
+        return sys.getsizeof(self.entries) + per_entry * self.filled
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'filled': self.filled,
+            'occupancy': round(self.occupancy(), 4),
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': round(self.hit_rate(), 4),
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+            'rejected': self.rejected,
+            'memory_bytes': self.memory_bytes(),
+        }
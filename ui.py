@@ -8,12 +8,25 @@ class UI:
         self.title_font = pygame.font.SysFont('Arial', 48, bold=True)
         self.small_font = pygame.font.SysFont('Arial', 18)
 
-    def draw_menu(self, current_size):
-        """Draws menu with Size Toggle."""
+        # Retained rendering of the game screen (see present())
+        self._backgrounds = {}  # Board size -> background surface with the empty grid
+        self._static = None  # (size, walls drawn, background + walls surface)
+        self._texts = {}  # (font, text, color) -> rendered surface
+        self._highlight = None  # Translucent cell used by highlight_moves
+        self._overlay = None  # (legal walls, orientation, surface, rect) of draw_legal_walls
+        self._scene = {}  # Elements of the frame being built: key -> (rect, draw function)
+        self._shown = {}  # Elements of the frame on screen
+        self._dirty = []  # Extra rectangles to repaint (new walls)
+        self._full_redraw = True
+        self._thinking_y = 220  # Set by _draw_hud: first free line under the wall counts
+
+    def draw_menu(self, current_size, player_count=2, engine='alphabeta'):
+        """Draws menu with Size, Player Count and AI Engine Toggles."""
+        self.invalidate()
         self.screen.fill(BACKGROUND)
 
         # Title
-        title = self.title_font.render("QUORIDOR", True, WALL_COLOR)
+        title = self._text(self.title_font, "QUORIDOR", WALL_COLOR)
         rect = title.get_rect(center=(SCREEN_WIDTH//2, 120))
         self.screen.blit(title, rect)
 
@@ -32,93 +45,250 @@ class UI:
         btn3_rect = pygame.Rect(0, 0, 200, 40)
         btn3_rect.center = (SCREEN_WIDTH//2, 420)
 
+        # Button 4: Player Count Toggle
+        btn4_rect = pygame.Rect(0, 0, 200, 40)
+        btn4_rect.center = (SCREEN_WIDTH//2, 480)
+
+        # Button 5: AI Engine Toggle (2-player games)
+        btn5_rect = pygame.Rect(0, 0, 200, 40)
+        btn5_rect.center = (SCREEN_WIDTH//2, 540)
+
         # Draw Buttons
         color1 = BUTTON_HOVER if btn1_rect.collidepoint((mx, my)) else BUTTON_COLOR
         color2 = BUTTON_HOVER if btn2_rect.collidepoint((mx, my)) else BUTTON_COLOR
         color3 = BUTTON_HOVER if btn3_rect.collidepoint((mx, my)) else BUTTON_COLOR
+        color4 = BUTTON_HOVER if btn4_rect.collidepoint((mx, my)) else BUTTON_COLOR
+        color5 = BUTTON_HOVER if btn5_rect.collidepoint((mx, my)) else BUTTON_COLOR
 
         pygame.draw.rect(self.screen, color1, btn1_rect, border_radius=10)
         pygame.draw.rect(self.screen, color2, btn2_rect, border_radius=10)
         pygame.draw.rect(self.screen, color3, btn3_rect, border_radius=10)
+        pygame.draw.rect(self.screen, color4, btn4_rect, border_radius=10)
+        pygame.draw.rect(self.screen, color5, btn5_rect, border_radius=10)
 
-        text1 = self.font.render("Human vs Human", True, WHITE)
-        text2 = self.font.render("Human vs Computer", True, WHITE)
-        text3 = self.font.render(f"Board Size: {current_size}x{current_size}", True, WHITE)
+        text1 = self._text(self.font, "Human vs Human", WHITE)
+        text2 = self._text(self.font, "Human vs Computer", WHITE)
+        text3 = self._text(self.font, f"Board Size: {current_size}x{current_size}", WHITE)
+        text4 = self._text(self.font, f"Players: {player_count}", WHITE)
+        engine_name = 'Paranoid' if player_count == 4 else {'alphabeta': 'Alpha-Beta', 'mcts': 'MCTS'}[engine]
+        text5 = self._text(self.font, f"AI: {engine_name}", WHITE)
 
         self.screen.blit(text1, text1.get_rect(center=btn1_rect.center))
         self.screen.blit(text2, text2.get_rect(center=btn2_rect.center))
         self.screen.blit(text3, text3.get_rect(center=btn3_rect.center))
+        self.screen.blit(text4, text4.get_rect(center=btn4_rect.center))
+        self.screen.blit(text5, text5.get_rect(center=btn5_rect.center))
 
-        return btn1_rect, btn2_rect, btn3_rect
+        return btn1_rect, btn2_rect, btn3_rect, btn4_rect, btn5_rect
 
-    def draw_game_screen(self, board, p1, p2, turn, input_mode, wall_orient):
-        self.screen.fill(BACKGROUND)
+    def draw_game_screen(self, board, players, turn, input_mode, wall_orient):
+        """
+        Starts a new game frame. Like highlight_moves / draw_ghost_wall /
+        draw_thinking it only records what the frame contains; present()
+        then redraws the parts that changed since the last frame.
+        """
+        self._scene = {}
+        self._update_static(board)
 
-        # 1. Draw Board Area
-        self._draw_grid(board)
-        self._draw_players(board, p1, p2)
+        # 1. Board Area (grid and walls live on the cached static surface)
+        self._draw_players(board, players)
 
-        # 2. Draw Side Panel / HUD
-        self._draw_hud(board, p1, p2, turn, input_mode, wall_orient)
+        # 2. Side Panel / HUD
+        self._draw_hud(board, players, turn, input_mode, wall_orient)
 
-    def _draw_hud(self, board, p1, p2, turn, input_mode, wall_orient):
+    def _draw_hud(self, board, players, turn, input_mode, wall_orient):
         # Calculate dynamic panel X position based on board width
         ox, oy = self._get_offsets(board.size)
-        board_width = board.size * (CELL_SIZE + MARGIN)
+        board_width = board.size * sum(self._cell_metrics(board.size))
         panel_x = ox + board_width + 40
 
         # Turn Info
-        lbl = self.font.render("Current Turn:", True, TEXT_COLOR)
-        self.screen.blit(lbl, (panel_x, 50))
-
-        turn_color = p1.color if turn == 1 else p2.color
-        turn_name = "Player 1" if turn == 1 else "Player 2"
-        if p2.id == "AI" and turn == 2: turn_name = "Computer"
+        self._add_text(self.font, "Current Turn:", TEXT_COLOR, (panel_x, 50))
 
-        val = self.title_font.render(turn_name, True, turn_color)
-        self.screen.blit(val, (panel_x, 80))
+        turn_color = players[turn - 1].color
+        turn_name = f"Player {turn}"
+        if players[turn - 1].id == "AI": turn_name = "Computer"
+        self._add_text(self.title_font, turn_name, turn_color, (panel_x, 80))
 
-        # Wall Counts
-        p1_stats = self.font.render(f"P1 Walls: {p1.walls_remaining}", True, p1.color)
-        p2_stats = self.font.render(f"P2 Walls: {p2.walls_remaining}", True, p2.color)
-        self.screen.blit(p1_stats, (panel_x, 150))
-        self.screen.blit(p2_stats, (panel_x, 180))
+        # Wall Counts (4-player games: the thinking line moves down below them)
+        for i, p in enumerate(players):
+            self._add_text(self.font, f"P{i + 1} Walls: {p.walls_remaining}", p.color, (panel_x, 150 + 30 * i))
+        self._thinking_y = 150 + 30 * len(players) + 10
 
         # Instructions
-        self.screen.blit(self.font.render("Controls:", True, WHITE), (panel_x, 300))
+        controls_y = self._thinking_y + 80  # Leaves room for the thinking lines
+        self._add_text(self.font, "Controls:", WHITE, (panel_x, controls_y))
 
         inst_list = [
             "TAB: Switch Move/Wall",
             "SPACE: Rotate Wall",
             "Click: Place / Move",
+            "L: Show Legal Walls",
             f"Mode: {input_mode}",
             f"Orient: {wall_orient}"
         ]
 
-        y = 340
+        y = controls_y + 40
         for line in inst_list:
-            t = self.small_font.render(line, True, TEXT_COLOR)
-            self.screen.blit(t, (panel_x, y))
+            self._add_text(self.small_font, line, TEXT_COLOR, (panel_x, y))
             y += 30
 
+    def draw_thinking(self, board, nodes, depth):
+        """'Thinking' indicator under the wall counts while the AI searches."""
+        ox, oy = self._get_offsets(board.size)
+        panel_x = ox + board.size * sum(self._cell_metrics(board.size)) + 40
+
+        dots = '.' * (pygame.time.get_ticks() // 400 % 4)
+        y = self._thinking_y
+        self._add_text(self.font, f"Thinking{dots}", WALL_COLOR, (panel_x, y))
+        self._add_text(self.small_font, f"Depth {depth} | {nodes:,} nodes", TEXT_COLOR, (panel_x, y + 30))
+
     def highlight_moves(self, board, moves):
+        cell = self._cell_metrics(board.size)[0]
+        if self._highlight is None or self._highlight.get_width() != cell:
+            self._highlight = pygame.Surface((cell, cell))
+            self._highlight.set_alpha(128)
+            self._highlight.fill(VALID_MOVE_COLOR)
+        highlight = self._highlight
         for move in moves:
             rect = self._get_cell_rect(board.size, move[0], move[1])
-            s = pygame.Surface((CELL_SIZE, CELL_SIZE))
-            s.set_alpha(128)
-            s.fill(VALID_MOVE_COLOR)
-            self.screen.blit(s, rect.topleft)
+            self._add(('highlight', move), rect, lambda rect=rect: self.screen.blit(highlight, rect.topleft))
 
-    def draw_ghost_wall(self, board, grid_x, grid_y, orientation):
-        # Only draw if valid range
+    def draw_ghost_wall(self, board, grid_x, grid_y, orientation, legal=True):
+        # Only draw if valid range; red if the wall cannot be placed there
         if 0 <= grid_x < board.size-1 and 0 <= grid_y < board.size-1:
-            self._draw_wall_graphic(board.size, (grid_x, grid_y), orientation, is_ghost=True)
+            rect = self._get_wall_rect(board.size, (grid_x, grid_y), orientation)
+            color = HOVER_COLOR if legal else ILLEGAL_WALL_COLOR
+            self._add(('ghost', grid_x, grid_y, orientation, legal), rect,
+                      lambda: pygame.draw.rect(self.screen, color, rect))
+
+    def draw_legal_walls(self, board, walls, orientation):
+        """
+        Every legal placement of one orientation, from walls ({(c, r, orient)},
+        computed once per turn). Rendered to one translucent surface, rebuilt
+        only when the set or the orientation changes.
+        """
+        cached = self._overlay
+        if cached is None or cached[0] is not walls or cached[1] != orientation:
+            ox, oy = self._get_offsets(board.size)
+            side = board.size * sum(self._cell_metrics(board.size))
+            area = pygame.Rect(ox, oy, side, side)
+            surface = pygame.Surface(area.size, pygame.SRCALPHA)
+            for c, r, orient in walls:
+                if orient == orientation:
+                    rect = self._get_wall_rect(board.size, (c, r), orient).move(-ox, -oy)
+                    pygame.draw.rect(surface, LEGAL_WALL_COLOR, rect)
+            cached = self._overlay = (walls, orientation, surface, area)
+        _, _, surface, area = cached
+        self._add(('legal_walls', id(walls), orientation), area, lambda: self.screen.blit(surface, area))
+
+    def present(self):
+        """
+        Puts the recorded game frame on screen. Only rectangles whose content
+        changed (a pawn moved, a wall appeared, the hover wall or a HUD line
+        changed) are restored from the static surface, redrawn and pushed
+        with pygame.display.update(); everything else stays as it is.
+        """
+        static = self._static[2]
+        if self._full_redraw:
+            self.screen.blit(static, (0, 0))
+            for rect, draw in self._scene.values():
+                draw()
+            pygame.display.flip()
+        else:
+            dirty = self._dirty
+            dirty += [rect for key, (rect, _) in self._shown.items() if key not in self._scene]
+            dirty += [rect for key, (rect, _) in self._scene.items() if key not in self._shown]
+            for area in dirty:
+                self.screen.set_clip(area)
+                self.screen.blit(static, area, area)
+                for rect, draw in self._scene.values():
+                    if rect.colliderect(area):
+                        draw()
+            self.screen.set_clip(None)
+            if dirty:
+                pygame.display.update(dirty)
+
+        self._shown = self._scene
+        self._dirty = []
+        self._full_redraw = False
+
+    def invalidate(self):
+        """The screen was drawn over directly (menu, game over): repaint everything next frame."""
+        self._full_redraw = True
+        self._shown = {}
+
+    # --- Retained rendering ---
+    def _add(self, key, rect, draw):
+        """Records one frame element; key must change whenever its look or place does."""
+        self._scene[key] = (rect, draw)
+
+    def _add_text(self, font, text, color, pos):
+        surface = self._text(font, text, color)
+        rect = surface.get_rect(topleft=pos)
+        self._add(('text', font, text, color, pos), rect, lambda: self.screen.blit(surface, rect))
+
+    def _text(self, font, text, color):
+        """Rendered text surfaces are cached; only new strings get rendered."""
+        key = (font, text, color)
+        surface = self._texts.get(key)
+        if surface is None:
+            if len(self._texts) >= TEXT_CACHE_SIZE:
+                self._texts.clear()  # Counters (e.g. AI nodes) produce endless new strings
+            surface = self._texts[key] = font.render(text, True, color)
+        return surface
+
+    def _get_background(self, size):
+        """Full-screen background with the empty grid, rendered once per board size."""
+        background = self._backgrounds.get(size)
+        if background is None:
+            background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            background.fill(BACKGROUND)
+            for c in range(size):
+                for r in range(size):
+                    pygame.draw.rect(background, GRID_COLOR, self._get_cell_rect(size, c, r))
+            self._backgrounds[size] = background
+        return background
+
+    def _update_static(self, board):
+        """Background + placed walls. New walls are painted on and marked dirty."""
+        walls = set(board.walls)
+        if self._static is None or self._static[0] != board.size or not self._static[1] <= walls:
+            # New game / other size: start over from the empty grid
+            self._static = (board.size, set(), self._get_background(board.size).copy())
+            self._full_redraw = True
+
+        size, drawn, surface = self._static
+        for pos, orientation in walls - drawn:
+            rect = self._get_wall_rect(size, pos, orientation)
+            pygame.draw.rect(surface, WALL_COLOR, rect)
+            self._dirty.append(rect)
+        self._static = (size, walls, surface)
+
+    def cell_at(self, size, pos):
+        """Grid (col, row) under a screen position; may be off the board."""
+        ox, oy = self._get_offsets(size)
+        step = sum(self._cell_metrics(size))
+        return (pos[0] - ox) // step, (pos[1] - oy) // step
 
     # --- Helpers ---
+    def _cell_metrics(self, size):
+        """
+        (cell, margin) in pixels: CELL_SIZE / MARGIN, scaled down for boards
+        that would not fit next to the HUD (13x13 and up).
+        """
+        step = CELL_SIZE + MARGIN
+        fit = min((SCREEN_HEIGHT - 40) // size, (SCREEN_WIDTH - 250 - 40) // size)
+        if fit >= step:
+            return CELL_SIZE, MARGIN
+        margin = max(2, fit * MARGIN // step)
+        return fit - margin, margin
+
     def _get_offsets(self, size):
         """Calculate centering offsets dynamically."""
-        total_w = size * (CELL_SIZE + MARGIN) - MARGIN
-        total_h = size * (CELL_SIZE + MARGIN) - MARGIN
+        cell, margin = self._cell_metrics(size)
+        total_w = size * (cell + margin) - margin
+        total_h = size * (cell + margin) - margin
         # We shift left slightly to leave room for the HUD on the right
         start_x = (SCREEN_WIDTH - 250 - total_w) // 2
         # But ensure it's not offscreen
@@ -126,43 +296,35 @@ class UI:
         start_y = (SCREEN_HEIGHT - total_h) // 2
         return start_x, start_y
 
-    def _draw_grid(self, board):
-        for c in range(board.size):
-            for r in range(board.size):
-                rect = self._get_cell_rect(board.size, c, r)
-                pygame.draw.rect(self.screen, GRID_COLOR, rect)
-
-        # Walls
-        for wall in board.walls:
-            self._draw_wall_graphic(board.size, wall[0], wall[1])
-
-    def _draw_players(self, board, p1, p2):
-        self._draw_pawn(board, p1)
-        self._draw_pawn(board, p2)
+    def _draw_players(self, board, players):
+        for player in players:
+            self._draw_pawn(board, player)
 
     def _get_cell_rect(self, size, c, r):
         ox, oy = self._get_offsets(size)
-        x = ox + c * (CELL_SIZE + MARGIN)
-        y = oy + r * (CELL_SIZE + MARGIN)
-        return pygame.Rect(x, y, CELL_SIZE, CELL_SIZE)
+        cell, margin = self._cell_metrics(size)
+        x = ox + c * (cell + margin)
+        y = oy + r * (cell + margin)
+        return pygame.Rect(x, y, cell, cell)
 
     def _draw_pawn(self, board, player):
         rect = self._get_cell_rect(board.size, player.pos[0], player.pos[1])
         center = rect.center
-        pygame.draw.circle(self.screen, BLACK, center, int(CELL_SIZE * 0.45)) # Outline
-        pygame.draw.circle(self.screen, player.color, center, int(CELL_SIZE * 0.4))
+        cell = rect.width
 
-    def _draw_wall_graphic(self, size, pos, orientation, is_ghost=False):
+        def draw():
+            pygame.draw.circle(self.screen, BLACK, center, int(cell * 0.45)) # Outline
+            pygame.draw.circle(self.screen, player.color, center, int(cell * 0.4))
+        self._add(('pawn', player.pos, player.color), rect, draw)
+
+    def _get_wall_rect(self, size, pos, orientation):
         c, r = pos
         ox, oy = self._get_offsets(size)
-        x = ox + c * (CELL_SIZE + MARGIN) + CELL_SIZE
-        y = oy + r * (CELL_SIZE + MARGIN) + CELL_SIZE
-
-        color = WALL_COLOR if not is_ghost else HOVER_COLOR
+        cell, margin = self._cell_metrics(size)
+        x = ox + c * (cell + margin) + cell
+        y = oy + r * (cell + margin) + cell
+        length = 2 * cell + margin  # WALL_LENGTH at the default cell size
 
         if orientation == 'V':
-            wall_rect = pygame.Rect(x, y - CELL_SIZE, MARGIN, WALL_LENGTH)
-        else:
-            wall_rect = pygame.Rect(x - CELL_SIZE, y, WALL_LENGTH, MARGIN)
-
-        pygame.draw.rect(self.screen, color, wall_rect)
+            return pygame.Rect(x, y - cell, margin, length)
+        return pygame.Rect(x - cell, y, length, margin)
@@ -0,0 +1,148 @@
+"""
+Batched wall evaluation: legality and path-length effect of many candidate
+walls in one call.
+
+The board is encoded as two boolean edge masks indexed [row, col]:
+    down[r, c]   the step (c, r) -> (c, r+1) is open
+    right[r, c]  the step (c, r) -> (c+1, r) is open
+A batch of K candidates becomes a (K, size, size) stack of those masks with
+each candidate's two edges cut, and a breadth-first search from the goal
+rows runs on all K boards at once until it reaches the pawns.
+
+NumPy is optional. Without it evaluate_walls falls back to placing and
+removing each wall on the board, with the same results.
+"""
+from settings import *
+from evaluation import DEFAULT_WEIGHTS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+
+def open_masks(board):
+    """(down, right) edge masks of the current board."""
+    n = board.size
+    down = np.zeros((n, n), dtype=bool)
+    right = np.zeros((n, n), dtype=bool)
+    for r in range(n):
+        for c in range(n):
+            for nc, nr in board.neighbors((c, r)):
+                if nr == r + 1:
+                    down[r, c] = True
+                elif nc == c + 1:
+                    right[r, c] = True
+    return down, right
+
+
+def pawn_distances(down, right, goal_rows, pos):
+    """
+    Shortest path length from pos[i] = (col, row) to goal_rows[i] on board i
+    of a stack: down/right are (K, n, n) masks. One breadth-first level per
+    iteration for all K boards together, stopping once every pawn has been
+    reached (or cannot be). Unreachable pawns get -1.
+    """
+    k = down.shape[0]
+    boards = np.arange(k)
+    cols = np.array([p[0] for p in pos])
+    rows = np.array([p[1] for p in pos])
+
+    reached = np.zeros(down.shape, dtype=bool)
+    reached[boards, np.asarray(goal_rows)] = True
+    frontier = reached.copy()
+    found = reached[boards, rows, cols]
+    dist = np.where(found, 0, -1)
+
+    d = 0
+    while not found.all() and frontier.any():
+        d += 1
+        step = np.zeros(down.shape, dtype=bool)
+        step[:, :-1, :] |= frontier[:, 1:, :] & down[:, :-1, :]
+        step[:, 1:, :] |= frontier[:, :-1, :] & down[:, :-1, :]
+        step[:, :, :-1] |= frontier[:, :, 1:] & right[:, :, :-1]
+        step[:, :, 1:] |= frontier[:, :, :-1] & right[:, :, :-1]
+        step &= ~reached
+        reached |= step
+        frontier = step
+
+        hit = step[boards, rows, cols]
+        dist[hit] = d
+        found |= hit
+    return dist
+
+
+def evaluate_walls(board, mover, other, walls, weights=DEFAULT_WEIGHTS):
+    """
+    Scores candidate walls (c, r, orientation) placed by `mover`.
+    Returns four lists aligned with walls:
+        legal       the wall fits and leaves both players a path
+        mover_dist  mover's shortest path after the wall (-1 if illegal)
+        other_dist  other's shortest path after the wall (-1 if illegal)
+        delta       change of the evaluation for mover from the distance
+                    and wall features of `weights`, wall spent included
+                    (0.0 if illegal)
+    """
+    if not walls:
+        return [], [], [], []
+    if np is None:
+        return _evaluate_walls_slow(board, mover, other, walls, weights)
+
+    k = len(walls)
+    fits = np.array([board._fits(c, r, o) for c, r, o in walls], dtype=bool)
+    cols = np.array([w[0] for w in walls])
+    rows = np.array([w[1] for w in walls])
+    vertical = np.array([w[2] == 'V' for w in walls])
+
+    down, right = open_masks(board)
+    down = np.repeat(down[None], k, axis=0)
+    right = np.repeat(right[None], k, axis=0)
+    h = np.flatnonzero(fits & ~vertical)
+    v = np.flatnonzero(fits & vertical)
+    down[h, rows[h], cols[h]] = False
+    down[h, rows[h], cols[h] + 1] = False
+    right[v, rows[v], cols[v]] = False
+    right[v, rows[v] + 1, cols[v]] = False
+
+    # Both players in one stack: first K boards for mover, next K for other
+    dist = pawn_distances(np.concatenate([down, down]), np.concatenate([right, right]),
+                          [mover.goal_row] * k + [other.goal_row] * k, [mover.pos] * k + [other.pos] * k)
+    mover_d, other_d = dist[:k], dist[k:]
+    legal = fits & (mover_d >= 0) & (other_d >= 0)
+
+    base_mover = board.get_shortest_path_len(mover.pos, mover.goal)
+    base_other = board.get_shortest_path_len(other.pos, other.goal)
+    delta = _delta(weights, base_mover, base_other, mover_d, other_d)
+
+    return (legal.tolist(), np.where(legal, mover_d, -1).tolist(),
+            np.where(legal, other_d, -1).tolist(), np.where(legal, delta, 0.0).tolist())
+
+
+def _delta(weights, base_mover, base_other, mover_dist, other_dist):
+    # Mover plays the 'ai' side of the evaluation
+    return ((other_dist - base_other) * weights['opp_dist'] + (mover_dist - base_mover) * weights['ai_dist']
+            - weights['ai_walls'])
+
+
+def _evaluate_walls_slow(board, mover, other, walls, weights):
+    """Reference path without NumPy: place, measure and remove each wall."""
+    base_mover = board.get_shortest_path_len(mover.pos, mover.goal)
+    base_other = board.get_shortest_path_len(other.pos, other.goal)
+    legal, mover_dist, other_dist, delta = [], [], [], []
+    for c, r, o in walls:
+        if board.place_wall(c, r, o, mover, other):
+            md = board.get_shortest_path_len(mover.pos, mover.goal)
+            od = board.get_shortest_path_len(other.pos, other.goal)
+            board.remove_wall(c, r, o)
+            legal.append(True)
+            mover_dist.append(md)
+            other_dist.append(od)
+            delta.append(_delta(weights, base_mover, base_other, md, od))
+        else:
+            legal.append(False)
+            mover_dist.append(-1)
+            other_dist.append(-1)
+            delta.append(0.0)
+    return legal, mover_dist, other_dist, delta
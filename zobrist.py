@@ -0,0 +1,74 @@
+import random
+
+# Walls a single player can hold (keys are indexed by walls_remaining)
+MAX_WALL_COUNT = 32
+# Pawn slots: two row goals, plus two column goals in 4-player games
+PAWN_SLOTS = 4
+
+_KEYS = {}
+
+class ZobristKeys:
+    """
+    Random 64-bit keys for every piece of position state on one board size.
+    Seeded from the size only, so every process (search workers, the opening
+    book builder, ...) derives exactly the same keys.
+    """
+    def __init__(self, size):
+        rng = random.Random(0x9E3779B9 ^ size)
+        cells = size * size
+        self.pawn = [[rng.getrandbits(64) for _ in range(cells)] for _ in range(2)]
+        self.wall = {
+            'H': [rng.getrandbits(64) for _ in range(cells)],
+            'V': [rng.getrandbits(64) for _ in range(cells)],
+        }
+        self.walls_left = [[rng.getrandbits(64) for _ in range(MAX_WALL_COUNT + 1)] for _ in range(2)]
+        self.side = rng.getrandbits(64)
+        # Drawn last so the 2-player keys above stay the same (saved books)
+        self.pawn += [[rng.getrandbits(64) for _ in range(cells)] for _ in range(PAWN_SLOTS - 2)]
+        self.walls_left += [[rng.getrandbits(64) for _ in range(MAX_WALL_COUNT + 1)]
+                            for _ in range(PAWN_SLOTS - 2)]
+        # Whose turn it is among more than two players (side only flips per ply)
+        self.turn = [rng.getrandbits(64) for _ in range(PAWN_SLOTS)]
+
+
+def get_keys(size):
+    if size not in _KEYS:
+        _KEYS[size] = ZobristKeys(size)
+    return _KEYS[size]
+
+
+def pawn_slot(player):
+    """Players are keyed by their goal, so p2 and an AI-controlled p2 share keys."""
+    if player.goal_col is not None:
+        return 3 if player.goal_col == 0 else 2
+    return 0 if player.goal_row == 0 else 1
+
+
+def position_key(size, walls, players, to_move):
+    """Full (non-incremental) key. Boards keep it up to date incrementally afterwards."""
+    keys = get_keys(size)
+    key = 0
+    for (c, r), orient in walls:
+        key ^= keys.wall[orient][r * size + c]
+    for p in players:
+        slot = pawn_slot(p)
+        key ^= keys.pawn[slot][p.pos[1] * size + p.pos[0]]
+        key ^= keys.walls_left[slot][p.walls_remaining]
+    if pawn_slot(to_move) == 1:
+        key ^= keys.side
+    return key
+
+
+def move_delta(size, player, move):
+    """
+    XOR delta for the mover's own state (pawn square or walls left) plus the
+    side-to-move flip. Must be computed before the move is played. The wall
+    itself is keyed by the board when it is placed/removed.
+    """
+    keys = get_keys(size)
+    slot = pawn_slot(player)
+    if move[0] == 'move':
+        (c, r), (nc, nr) = player.pos, move[1]
+        return keys.side ^ keys.pawn[slot][r * size + c] ^ keys.pawn[slot][nr * size + nc]
+    left = player.walls_remaining
+    return keys.side ^ keys.walls_left[slot][left] ^ keys.walls_left[slot][left - 1]